@@ -1,13 +1,44 @@
 # api/app.py
-from flask import Flask, request, jsonify, Response
-from models import Product
-from manager import ProductManager
-from typing import Tuple, Dict, Any
+from flask import (Flask, request, jsonify, Response, stream_with_context,
+                   g)
+from manager import (ProductManager, VersionConflictError,
+                     CouponNotFoundError)
+from cache import LRUCache
+from validation import (validate_new_product, validate_product_update,
+                        parse_ndjson, split_bulk_rows, validate_campaign,
+                        validate_campaign_filter)
+from http_utils import (product_etag, catalog_etag, version_from_etags,
+                        parse_bool_arg, parse_page_args, parse_product_filter,
+                        next_page_cursor)
+from serializers import (serialize_product, serialize_columns,
+                         iter_columns_json)
+from database import get_pool, PoolTimeoutError
+from services import discount_client_stats
+from metrics import record_request, metrics_payload
+from slow_queries import slow_query_log
+from typing import Tuple, Dict, Any, List, Optional
 
-from decimal import Decimal, InvalidOperation
+import os
+import time
 
 app = Flask(__name__)
-manager = ProductManager()
+
+# Кэш продуктов по id: 0 записей = кэш выключен
+PRODUCT_CACHE_SIZE = int(os.environ.get("PRODUCT_CACHE_SIZE", "0"))
+PRODUCT_CACHE_TTL = float(os.environ.get("PRODUCT_CACHE_TTL", "30"))
+
+manager = ProductManager(
+    cache=LRUCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+    if PRODUCT_CACHE_SIZE > 0 else None)
+
+# Максимальный размер страницы для GET /products?limit=
+PRODUCTS_MAX_LIMIT = int(os.environ.get("PRODUCTS_MAX_LIMIT", "1000"))
+# Ограничение размера одного импорта POST /products/bulk
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", "100000"))
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonlines')
+EXPORT_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# Размер пачки (строк) при потоковой отдаче всего каталога
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", "1000"))
 
 
 @app.route('/health', methods=['GET'])
@@ -15,67 +46,149 @@ def health_check() -> Tuple[Response, int]:
     return jsonify({"status": "healthy"}), 200
 
 
+@app.before_request
+def start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    # Шаблон маршрута, а не путь: /product/<int:product_id>, без роста
+    # числа серий от id; ненайденные маршруты - одной серией
+    started = g.pop('request_started', None)
+    rule = request.url_rule.rule if request.url_rule is not None \
+        else "<unmatched>"
+    if started is not None and rule != '/metrics':
+        record_request(request.method, rule, response.status_code,
+                       time.perf_counter() - started)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics() -> Response:
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/debug/stats', methods=['GET'])
+def debug_stats() -> Tuple[Response, int]:
+    # Статистика внутренних подсистем (пул соединений и т.д.)
+    return jsonify({"db_pool": get_pool().stats(),
+                    "discount_client": discount_client_stats(),
+                    "product_cache": manager.cache.stats()
+                    if manager.cache is not None else None}), 200
+
+
+@app.route('/debug/slow-queries', methods=['GET'])
+def debug_slow_queries() -> Tuple[Response, int]:
+    # Последние медленные запросы и самые дорогие операторы по сумме времени
+    try:
+        top = int(request.args.get('top', '20'))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    return jsonify(slow_query_log.snapshot(top)), 200
+
+
+@app.route('/debug/slow-queries', methods=['DELETE'])
+def reset_slow_queries() -> Tuple[Response, int]:
+    slow_query_log.clear()
+    return Response("", status=204), 204
+
+
+@app.errorhandler(PoolTimeoutError)
+def handle_pool_timeout(error: PoolTimeoutError) -> Tuple[Response, int]:
+    # Все соединения заняты: честно сообщаем о перегрузке
+    return jsonify({"error": "Database is busy, try again later"}), 503
+
+
 @app.route('/product/<int:product_id>', methods=['GET'])
 def get_product(product_id) -> Tuple[Response, int]:
     product = manager.get_product_by_id(product_id)
     if product is None:
         return jsonify({"error": "Product not found"}), 404
-        # Преобразуем объект Product DTO в словарь для JSON
-    return jsonify(product.__dict__), 200
+    etag = product_etag(product)
+    if request.if_none_match.contains_weak(etag):
+        # Клиент уже видел эту версию строки: тело не нужно
+        return _not_modified(etag), 304
+    response = _json_response(serialize_product(product))
+    _set_validators(response, etag)
+    return response, 200
 
 
 @app.route('/product', methods=['POST'])
 def add_product() -> Tuple[Response, int]:
     data: Dict[str, Any] = request.get_json()
-    name = data.get('name')
-    price_str = data.get('price')
-    if not name or not price_str:
-        return jsonify({"error": "Missing name or price"}), 400
-    if len(name) > 100 or len(
-            name) < 1:
-        return jsonify({"error": "Invalid name"}), 400
-    try:
-        price_decimal = Decimal(str(price_str))
-        if price_decimal < 0:
-            return jsonify({"error": "Price must be positive"}), 400
-    except InvalidOperation:
-        return jsonify({"error": "Price must be a valid number"}), 400
-
-    product = Product(name=name, price=price_decimal,
-                      is_active=data.get('is_active', True),
-                      original_price=price_decimal)
+    product, error = validate_new_product(data)
+    if product is None:
+        return jsonify({"error": error}), 400
     product_id = manager.add_product(product)
     return jsonify({"status": "success", "id": product_id}), 201
 
 
+def _read_bulk_rows() -> Optional[List[Any]]:
+    """Строки для импорта: JSON-массив или NDJSON (по одной на строку)."""
+    if request.mimetype in NDJSON_MIMETYPES:
+        return parse_ndjson(request.stream)
+    data = request.get_json(silent=True)
+    return data if isinstance(data, list) else None
+
+
+@app.route('/products/bulk', methods=['POST'])
+def bulk_add_products() -> Tuple[Response, int]:
+    rows = _read_bulk_rows()
+    if rows is None:
+        return jsonify({"error": "Expected a JSON array or NDJSON body"}), 400
+    if len(rows) > BULK_MAX_ROWS:
+        return jsonify({"error": f"Too many rows (max {BULK_MAX_ROWS})"}), 413
+
+    valid_products, valid_indexes, errors = split_bulk_rows(rows)
+
+    # ids выровнены по входным строкам: null для отклонённых
+    ids: List[Optional[int]] = [None] * len(rows)
+    for index, product_id in zip(valid_indexes,
+                                 manager.add_products(valid_products)):
+        ids[index] = product_id
+    status = 201 if valid_products else 400
+    return jsonify({"status": "success" if valid_products else "error",
+                    "inserted": len(valid_products),
+                    "ids": ids, "errors": errors}), status
+
+
 @app.route('/product/<int:product_id>', methods=['PUT'])
 def update_product(product_id: int) -> Tuple[Response, int]:
     data: Dict[str, Any] = request.get_json()
-    name = data.get('name')
-    price_str = data.get('price')
+    update_data, error = validate_product_update(data)
+    if update_data is None:
+        return jsonify({"error": error}), 400
 
-    if not name or not price_str:
-        return jsonify({"error": "Missing name or price"}), 400
-    if len(name) > 100 or len(name) < 1:
-        return jsonify({"error": "Invalid name length (1-100)"}), 400
+    # Оптимистическая блокировка: If-Match с ETag из GET или поле version
+    expected_version: Optional[int] = None
+    conflict_status = 409
+    if request.if_match and not request.if_match.star_tag:
+        expected_version = version_from_etags(product_id, request.if_match)
+        if expected_version is None:
+            return jsonify({"error": "Precondition failed"}), 412
+        conflict_status = 412
+    elif data.get('version') is not None:
+        if not isinstance(data['version'], int):
+            return jsonify({"error": "version must be an integer"}), 400
+        expected_version = data['version']
 
     try:
-        Decimal(str(price_str))
-    except InvalidOperation:
-        return jsonify({"error": "Price must be a valid number"}), 400
-
-    update_data: Dict[str, Any] = {
-        'name': name,
-        'price': price_str,  # Отправляем как строку
-        'is_active': data.get('is_active', True),
-        'coupon_code': data.get('coupon_code', None)
-    }
-    status_success = manager.update_product(product_id, update_data)
-
-    if not status_success:
+        updated_product = manager.update_product(product_id, update_data,
+                                                 expected_version)
+    except VersionConflictError as e:
+        return jsonify({"error": "Product was modified by another request",
+                        "current_version": e.current_version}), \
+            conflict_status
+
+    if updated_product is None:
         return jsonify({"error": "Product not found"}), 404
 
-    return jsonify({"status": "success", "id": product_id}), 200
+    response = jsonify({"status": "success", "id": product_id})
+    # Новый ETag, чтобы клиент мог сразу отправить следующий If-Match
+    response.set_etag(product_etag(updated_product))
+    return response, 200
 
 
 @app.route('/product/<int:product_id>', methods=['DELETE'])
@@ -84,11 +197,103 @@ def delete_product(product_id) -> Tuple[Response, int]:
     return Response("", status=204), 204
 
 
+@app.route('/campaigns/apply', methods=['POST'])
+def apply_campaign() -> Tuple[Response, int]:
+    # Купон ко всем продуктам под фильтром одним UPDATE в БД
+    campaign, error = validate_campaign(request.get_json(silent=True))
+    if campaign is None:
+        return jsonify({"error": error}), 400
+    coupon_code, product_filter = campaign
+    try:
+        updated = manager.apply_campaign(coupon_code, product_filter)
+    except CouponNotFoundError:
+        return jsonify({"error": "Coupon not found"}), 404
+    return jsonify({"status": "success", "updated": updated}), 200
+
+
+@app.route('/campaigns/revert', methods=['POST'])
+def revert_campaign() -> Tuple[Response, int]:
+    # Возврат к original_price для продуктов под фильтром
+    product_filter, error = validate_campaign_filter(
+        request.get_json(silent=True))
+    if product_filter is None:
+        return jsonify({"error": error}), 400
+    updated = manager.revert_campaign(product_filter)
+    return jsonify({"status": "success", "updated": updated}), 200
+
+
+def _set_validators(response: Response, etag: str) -> None:
+    # Сильный ETag + no-cache: браузер кэширует, но всегда перепроверяет
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    _set_validators(response, etag)
+    return response
+
+
+def _json_response(body: bytes) -> Response:
+    # Тело уже сериализовано (serializers.py), jsonify не нужен
+    return Response(body, mimetype='application/json')
+
+
 @app.route('/products', methods=['GET'])
 def get_all_products() -> Tuple[Response, int]:
-    products_list = manager.get_all_products()
-    products_dict_list = [p.__dict__ for p in products_list]
-    return jsonify(products_dict_list), 200
+    # Версию читаем до данных: при гонке с записью клиент получит
+    # лишний полный ответ, но никогда не устаревший 304
+    etag = catalog_etag(manager.get_catalog_version())
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag), 304
+
+    try:
+        product_filter = parse_product_filter(request.args)
+        page = parse_page_args(request.args, PRODUCTS_MAX_LIMIT,
+                               product_filter.sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if page is None:
+        # Без пагинации весь каталог отдаётся потоком: в памяти
+        # только текущая порция строк
+        response = Response(
+            stream_with_context(iter_columns_json(
+                manager.iter_product_columns(STREAM_BATCH_SIZE,
+                                             product_filter))),
+            mimetype='application/json')
+        _set_validators(response, etag)
+        return response, 200
+
+    limit, after = page
+    columns = manager.get_products_page_columns(limit, after,
+                                                product_filter)
+    response = _json_response(serialize_columns(columns))
+    _set_validators(response, etag)
+    if len(columns) == limit:
+        # Курсор следующей страницы; его нет на последней странице
+        response.headers['X-Next-Cursor'] = next_page_cursor(
+            columns, product_filter.sort)
+    return response, 200
+
+
+@app.route('/products/export', methods=['GET'])
+def export_products() -> Tuple[Response, int]:
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    is_active: Optional[bool] = None
+    if request.args.get('is_active') is not None:
+        try:
+            is_active = parse_bool_arg(request.args['is_active'])
+        except ValueError:
+            return jsonify({"error": "is_active must be true or false"}), 400
+
+    chunks = manager.export_products(export_format, is_active)
+    response = Response(stream_with_context(chunks),
+                        mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="products.{export_format}"'
+    return response, 200
 
 
 if __name__ == '__main__':
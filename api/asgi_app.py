@@ -0,0 +1,295 @@
+# api/asgi_app.py
+# ASGI-вариант API (Quart): те же маршруты и JSON-контракты, что в app.py,
+# но запросы к БД и сервису скидок не занимают поток на время ожидания.
+# Запуск: hypercorn asgi_app:app --bind 0.0.0.0:5000
+from quart import Quart, request, jsonify, Response, g
+from psycopg_pool import PoolTimeout
+from async_manager import AsyncProductManager
+from async_database import open_async_pool, close_async_pool, async_pool_stats
+from async_services import discount_client_stats, close_async_client
+from metrics import record_request, metrics_payload
+from slow_queries import slow_query_log
+from manager import VersionConflictError, CouponNotFoundError
+from models import ProductFilter
+from cache import LRUCache
+from validation import (validate_new_product, validate_product_update,
+                        parse_ndjson, split_bulk_rows, validate_campaign,
+                        validate_campaign_filter)
+from serializers import serialize_product, serialize_columns
+from http_utils import (product_etag, catalog_etag, version_from_etags,
+                        parse_bool_arg, parse_page_args, parse_product_filter,
+                        next_page_cursor)
+from app import (PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL, PRODUCTS_MAX_LIMIT,
+                 BULK_MAX_ROWS, NDJSON_MIMETYPES, EXPORT_MIMETYPES,
+                 STREAM_BATCH_SIZE)
+from typing import Tuple, Dict, Any, AsyncIterator, List, Optional
+import time
+
+app = Quart(__name__)
+
+manager = AsyncProductManager(
+    cache=LRUCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+    if PRODUCT_CACHE_SIZE > 0 else None)
+
+
+@app.before_serving
+async def startup() -> None:
+    await open_async_pool()
+
+
+@app.after_serving
+async def shutdown() -> None:
+    await close_async_client()
+    await close_async_pool()
+
+
+@app.route('/health', methods=['GET'])
+async def health_check() -> Tuple[Response, int]:
+    return jsonify({"status": "healthy"}), 200
+
+
+@app.before_request
+async def start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request_metrics(response: Response) -> Response:
+    # Шаблон маршрута, а не путь: /product/<int:product_id>, без роста
+    # числа серий от id; ненайденные маршруты - одной серией
+    started = g.pop('request_started', None)
+    rule = request.url_rule.rule if request.url_rule is not None \
+        else "<unmatched>"
+    if started is not None and rule != '/metrics':
+        record_request(request.method, rule, response.status_code,
+                       time.perf_counter() - started)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics() -> Response:
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/debug/stats', methods=['GET'])
+async def debug_stats() -> Tuple[Response, int]:
+    return jsonify({"db_pool": async_pool_stats(),
+                    "discount_client": discount_client_stats(),
+                    "product_cache": manager.cache.stats()
+                    if manager.cache is not None else None}), 200
+
+
+@app.route('/debug/slow-queries', methods=['GET'])
+async def debug_slow_queries() -> Tuple[Response, int]:
+    # Последние медленные запросы и самые дорогие операторы по сумме времени
+    try:
+        top = int(request.args.get('top', '20'))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    return jsonify(slow_query_log.snapshot(top)), 200
+
+
+@app.route('/debug/slow-queries', methods=['DELETE'])
+async def reset_slow_queries() -> Tuple[Response, int]:
+    slow_query_log.clear()
+    return Response("", status=204), 204
+
+
+@app.errorhandler(PoolTimeout)
+async def handle_pool_timeout(error: PoolTimeout) -> Tuple[Response, int]:
+    return jsonify({"error": "Database is busy, try again later"}), 503
+
+
+@app.route('/product/<int:product_id>', methods=['GET'])
+async def get_product(product_id: int) -> Tuple[Response, int]:
+    product = await manager.get_product_by_id(product_id)
+    if product is None:
+        return jsonify({"error": "Product not found"}), 404
+    etag = product_etag(product)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag), 304
+    response = _json_response(serialize_product(product))
+    _set_validators(response, etag)
+    return response, 200
+
+
+@app.route('/product', methods=['POST'])
+async def add_product() -> Tuple[Response, int]:
+    data: Dict[str, Any] = await request.get_json()
+    product, error = validate_new_product(data)
+    if product is None:
+        return jsonify({"error": error}), 400
+    product_id = await manager.add_product(product)
+    return jsonify({"status": "success", "id": product_id}), 201
+
+
+async def _read_bulk_rows() -> Optional[List[Any]]:
+    """Строки для импорта: JSON-массив или NDJSON (по одной на строку)."""
+    if request.mimetype in NDJSON_MIMETYPES:
+        body = await request.get_data()
+        return parse_ndjson(body.splitlines())
+    data = await request.get_json(silent=True)
+    return data if isinstance(data, list) else None
+
+
+@app.route('/products/bulk', methods=['POST'])
+async def bulk_add_products() -> Tuple[Response, int]:
+    rows = await _read_bulk_rows()
+    if rows is None:
+        return jsonify({"error": "Expected a JSON array or NDJSON body"}), 400
+    if len(rows) > BULK_MAX_ROWS:
+        return jsonify({"error": f"Too many rows (max {BULK_MAX_ROWS})"}), 413
+
+    valid_products, valid_indexes, errors = split_bulk_rows(rows)
+
+    ids: List[Optional[int]] = [None] * len(rows)
+    for index, product_id in zip(valid_indexes,
+                                 await manager.add_products(valid_products)):
+        ids[index] = product_id
+    status = 201 if valid_products else 400
+    return jsonify({"status": "success" if valid_products else "error",
+                    "inserted": len(valid_products),
+                    "ids": ids, "errors": errors}), status
+
+
+@app.route('/product/<int:product_id>', methods=['PUT'])
+async def update_product(product_id: int) -> Tuple[Response, int]:
+    data: Dict[str, Any] = await request.get_json()
+    update_data, error = validate_product_update(data)
+    if update_data is None:
+        return jsonify({"error": error}), 400
+
+    expected_version: Optional[int] = None
+    conflict_status = 409
+    if request.if_match and not request.if_match.star_tag:
+        expected_version = version_from_etags(product_id, request.if_match)
+        if expected_version is None:
+            return jsonify({"error": "Precondition failed"}), 412
+        conflict_status = 412
+    elif data.get('version') is not None:
+        if not isinstance(data['version'], int):
+            return jsonify({"error": "version must be an integer"}), 400
+        expected_version = data['version']
+
+    try:
+        updated_product = await manager.update_product(
+            product_id, update_data, expected_version)
+    except VersionConflictError as e:
+        return jsonify({"error": "Product was modified by another request",
+                        "current_version": e.current_version}), \
+            conflict_status
+
+    if updated_product is None:
+        return jsonify({"error": "Product not found"}), 404
+
+    response = jsonify({"status": "success", "id": product_id})
+    response.set_etag(product_etag(updated_product))
+    return response, 200
+
+
+@app.route('/product/<int:product_id>', methods=['DELETE'])
+async def delete_product(product_id: int) -> Tuple[Response, int]:
+    await manager.delete_product(product_id)
+    return Response("", status=204), 204
+
+
+@app.route('/campaigns/apply', methods=['POST'])
+async def apply_campaign() -> Tuple[Response, int]:
+    # Купон ко всем продуктам под фильтром одним UPDATE в БД
+    campaign, error = validate_campaign(await request.get_json(silent=True))
+    if campaign is None:
+        return jsonify({"error": error}), 400
+    coupon_code, product_filter = campaign
+    try:
+        updated = await manager.apply_campaign(coupon_code, product_filter)
+    except CouponNotFoundError:
+        return jsonify({"error": "Coupon not found"}), 404
+    return jsonify({"status": "success", "updated": updated}), 200
+
+
+@app.route('/campaigns/revert', methods=['POST'])
+async def revert_campaign() -> Tuple[Response, int]:
+    # Возврат к original_price для продуктов под фильтром
+    product_filter, error = validate_campaign_filter(
+        await request.get_json(silent=True))
+    if product_filter is None:
+        return jsonify({"error": error}), 400
+    updated = await manager.revert_campaign(product_filter)
+    return jsonify({"status": "success", "updated": updated}), 200
+
+
+def _set_validators(response: Response, etag: str) -> None:
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response("", status=304)
+    _set_validators(response, etag)
+    return response
+
+
+def _json_response(body: bytes) -> Response:
+    return Response(body, mimetype='application/json')
+
+
+async def _stream_products_json(product_filter: ProductFilter
+                                ) -> AsyncIterator[bytes]:
+    # Тот же формат, что serializers.iter_columns_json
+    yield b"["
+    separator = b""
+    async for columns in manager.iter_product_columns(STREAM_BATCH_SIZE,
+                                                     product_filter):
+        if len(columns):
+            yield separator + serialize_columns(columns)[1:-1]
+            separator = b","
+    yield b"]"
+
+
+@app.route('/products', methods=['GET'])
+async def get_all_products() -> Tuple[Response, int]:
+    etag = catalog_etag(await manager.get_catalog_version())
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag), 304
+
+    try:
+        product_filter = parse_product_filter(request.args)
+        page = parse_page_args(request.args, PRODUCTS_MAX_LIMIT,
+                               product_filter.sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if page is None:
+        response = Response(_stream_products_json(product_filter),
+                            mimetype='application/json')
+        _set_validators(response, etag)
+        return response, 200
+
+    limit, after = page
+    columns = await manager.get_products_page_columns(limit, after,
+                                                      product_filter)
+    response = _json_response(serialize_columns(columns))
+    _set_validators(response, etag)
+    if len(columns) == limit:
+        response.headers['X-Next-Cursor'] = next_page_cursor(
+            columns, product_filter.sort)
+    return response, 200
+
+
+@app.route('/products/export', methods=['GET'])
+async def export_products() -> Tuple[Response, int]:
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    is_active: Optional[bool] = None
+    if request.args.get('is_active') is not None:
+        try:
+            is_active = parse_bool_arg(request.args['is_active'])
+        except ValueError:
+            return jsonify({"error": "is_active must be true or false"}), 400
+
+    response = Response(manager.export_products(export_format, is_active),
+                        mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="products.{export_format}"'
+    return response, 200
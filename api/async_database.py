@@ -0,0 +1,130 @@
+# api/async_database.py
+# Асинхронный пул соединений (psycopg 3) для ASGI-варианта API.
+# Параметры те же, что у синхронного пула в database.py.
+from typing import Any, Dict, List, Optional
+import time
+
+import psycopg
+from psycopg import AsyncConnection, AsyncCursor, AsyncServerCursor
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+from database import (DB_HOST, DB_NAME, DB_USER, DB_PASS, DB_POOL_MIN,
+                      DB_POOL_MAX, DB_POOL_TIMEOUT, DB_PREPARED_STATEMENTS,
+                      EXPLAIN_PREFIX)
+from metrics import observe_stage, observe_stage_seconds
+from slow_queries import slow_query_log
+
+_pool: Optional[AsyncConnectionPool] = None
+
+
+async def explain_query(conn: AsyncConnection, query: Any,
+                        params: Any) -> str:
+    """См. database.explain_query; EXPLAIN под SAVEPOINT транзакции."""
+    async with AsyncCursor(conn) as cursor:
+        async with conn.transaction(savepoint_name="slow_query_explain",
+                                    force_rollback=True):
+            try:
+                await cursor.execute(EXPLAIN_PREFIX + query, params)
+            except psycopg.Error as e:
+                return f"EXPLAIN failed: {e}".strip()
+            return "\n".join(row[0] for row in await cursor.fetchall())
+
+
+async def _track(cursor: AsyncCursor, query: Any, params: Any,
+                 started: float, explain: bool) -> None:
+    seconds = time.perf_counter() - started
+    observe_stage_seconds("db", seconds)
+    if slow_query_log.track(query, seconds):
+        plan = None
+        if explain and slow_query_log.wants_explain(query):
+            plan = await explain_query(cursor.connection, query, params)
+        slow_query_log.record(query, params, seconds, plan)
+
+
+class TimedAsyncCursor(AsyncCursor):
+    """Метрики и журнал медленных запросов, как database.TimedCursor."""
+
+    async def execute(self, query: Any, params: Any = None,
+                      **kwargs: Any) -> "TimedAsyncCursor":
+        started = time.perf_counter()
+        await super().execute(query, params, **kwargs)
+        await _track(self, query, params, started, explain=True)
+        return self
+
+
+class TimedAsyncServerCursor(AsyncServerCursor):
+
+    async def execute(self, query: Any, params: Any = None,
+                      **kwargs: Any) -> "TimedAsyncServerCursor":
+        started = time.perf_counter()
+        await super().execute(query, params, **kwargs)
+        await _track(self, query, params, started, explain=False)
+        return self
+
+    async def fetchmany(self, size: int = 0) -> List[Any]:
+        with observe_stage("db"):
+            return await super().fetchmany(size)
+
+
+async def _configure(conn: AsyncConnection) -> None:
+    conn.cursor_factory = TimedAsyncCursor
+    conn.server_cursor_factory = TimedAsyncServerCursor
+
+
+async def open_async_pool() -> AsyncConnectionPool:
+    """Открывает пул при старте приложения (внутри event loop)."""
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            make_conninfo(host=DB_HOST, dbname=DB_NAME, user=DB_USER,
+                          password=DB_PASS),
+            min_size=DB_POOL_MIN, max_size=DB_POOL_MAX,
+            # psycopg 3 сам готовит операторы на соединении; тот же
+            # переключатель, что и для синхронного ProductManager
+            kwargs={"prepare_threshold": 0 if DB_PREPARED_STATEMENTS
+                    else None},
+            timeout=DB_POOL_TIMEOUT,
+            # Проверка соединения при выдаче из пула
+            check=AsyncConnectionPool.check_connection,
+            configure=_configure,
+            open=False)
+        await _pool.open()
+    return _pool
+
+
+async def close_async_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_async_pool() -> AsyncConnectionPool:
+    if _pool is None:
+        raise RuntimeError("Async pool is not open; call open_async_pool()")
+    return _pool
+
+
+def async_pool_stats() -> Dict[str, Any]:
+    """Статистика psycopg_pool в тех же ключах, что ConnectionPool.stats()."""
+    pool = get_async_pool()
+    stats = pool.get_stats()
+    size = stats.get("pool_size", 0)
+    idle = stats.get("pool_available", 0)
+    checkouts = stats.get("requests_num", 0)
+    wait_ms = stats.get("requests_wait_ms", 0)
+    return {
+        "min_size": pool.min_size,
+        "max_size": pool.max_size,
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "waiting": stats.get("requests_waiting", 0),
+        "checkouts": checkouts,
+        "timeouts": stats.get("requests_errors", 0),
+        "discarded": stats.get("connections_lost", 0),
+        "wait_time_total_ms": wait_ms,
+        "wait_time_avg_ms": round(wait_ms / checkouts, 3)
+        if checkouts else 0.0,
+    }
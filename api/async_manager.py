@@ -0,0 +1,222 @@
+# api/async_manager.py
+# Асинхронный вариант ProductManager (psycopg 3 + AsyncConnectionPool).
+# SQL и преобразование строк общие с синхронной версией (queries.py).
+from async_database import get_async_pool
+from async_services import get_discount_multiplier
+from cache import LRUCache
+from copy_stream import COPY_CHUNK_SIZE
+from manager import VersionConflictError, CouponNotFoundError
+from models import Product, ProductColumns, ProductFilter
+import queries
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+from decimal import Decimal
+
+
+class AsyncProductManager:
+    """То же, что ProductManager, но без блокировки event loop."""
+
+    def __init__(self, cache: Optional[LRUCache[Product]] = None) -> None:
+        self.cache = cache
+
+    def _invalidate(self, product_id: int) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(product_id)
+
+    async def get_product_by_id(self, product_id: int) -> Optional[Product]:
+        if self.cache is None:
+            return await self._fetch_product(product_id)
+        product = self.cache.get(product_id)
+        if product is None:
+            product = await self._fetch_product(product_id)
+            if product is not None:
+                self.cache.put(product_id, product)
+        return product
+
+    async def _fetch_product(self, product_id: int) -> Optional[Product]:
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(queries.SELECT_PRODUCT_BY_ID,
+                                        (product_id,))
+            result = await cursor.fetchone()
+            if result is None:
+                return None
+            return queries.row_to_product(result)
+
+    async def add_product(self, product: Product) -> int:
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(
+                queries.INSERT_PRODUCT,
+                (product.name, product.price, product.is_active,
+                 product.original_price))
+            result = await cursor.fetchone()
+            if result is None:
+                raise Exception("Failed to retrieve new product ID.")
+            new_id = result[0]
+        self._invalidate(new_id)
+        return new_id
+
+    async def add_products(self, products: List[Product]) -> List[int]:
+        """
+        Пакетная вставка с заранее выделенными id (см. ProductManager).
+        psycopg 3 передаёт строки в COPY без промежуточного CSV,
+        поэтому COPY используется для пакетов любого размера.
+        """
+        if not products:
+            return []
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(queries.NEXT_PRODUCT_IDS,
+                                     (len(products),))
+                new_ids = [row[0] for row in await cursor.fetchall()]
+                async with cursor.copy(
+                        queries.COPY_PRODUCT_ROWS_FROM_STDIN) as copy:
+                    for new_id, p in zip(new_ids, products):
+                        await copy.write_row((new_id, p.name, p.price,
+                                              p.is_active, p.original_price))
+        return new_ids
+
+    async def _price_update_args(self, price: Any, coupon_code: Optional[str]
+                                 ) -> Tuple[Optional[Decimal], Decimal]:
+        """См. ProductManager._price_update_args."""
+        if coupon_code:
+            return None, await get_discount_multiplier(coupon_code)
+        if coupon_code == "":
+            return None, Decimal('1')
+        return Decimal(str(price)), Decimal('1')
+
+    async def update_product(self, product_id: int,
+                             update_data: Dict[str, Any],
+                             expected_version: Optional[int] = None
+                             ) -> Optional[Product]:
+        coupon_code = update_data.get('coupon_code')
+        price, multiplier = await self._price_update_args(
+            update_data['price'], coupon_code)
+        query = queries.update_product_sql(expected_version is not None)
+        params: List[Any] = [update_data['name'], update_data['is_active'],
+                             price, multiplier, product_id]
+        if expected_version is not None:
+            params.append(expected_version)
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(query, params)
+            result = await cursor.fetchone()
+            if result is None and expected_version is not None:
+                cursor = await conn.execute(queries.SELECT_PRODUCT_VERSION,
+                                            (product_id,))
+                current = await cursor.fetchone()
+                if current is not None:
+                    raise VersionConflictError(product_id, current[0])
+        self._invalidate(product_id)
+        if result is None:
+            return None
+        return queries.row_to_product(result)
+
+    def _invalidate_filtered(self, product_filter: ProductFilter) -> None:
+        if self.cache is None:
+            return
+        if product_filter.ids is not None:
+            for product_id in product_filter.ids:
+                self.cache.invalidate(product_id)
+        else:
+            self.cache.clear()
+
+    async def apply_campaign(self, coupon_code: str,
+                             product_filter: ProductFilter) -> int:
+        """См. ProductManager.apply_campaign."""
+        query, params = queries.apply_campaign_sql(coupon_code,
+                                                   product_filter)
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(query, params)
+            updated = cursor.rowcount
+            if updated == 0:
+                cursor = await conn.execute(queries.SELECT_COUPON_EXISTS,
+                                            (coupon_code,))
+                if await cursor.fetchone() is None:
+                    raise CouponNotFoundError(coupon_code)
+        self._invalidate_filtered(product_filter)
+        return updated
+
+    async def revert_campaign(self, product_filter: ProductFilter) -> int:
+        query, params = queries.revert_campaign_sql(product_filter)
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(query, params)
+            updated = cursor.rowcount
+        self._invalidate_filtered(product_filter)
+        return updated
+
+    async def delete_product(self, product_id: int) -> bool:
+        async with get_async_pool().connection() as conn:
+            await conn.execute(queries.DELETE_PRODUCT, (product_id,))
+        self._invalidate(product_id)
+        return True
+
+    async def get_catalog_version(self) -> int:
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(queries.SELECT_CATALOG_VERSION)
+            result = await cursor.fetchone()
+            return result[0] if result is not None else 0
+
+    async def get_products_page(self, limit: int,
+                                after_id: Optional[int] = None
+                                ) -> List[Product]:
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(
+                queries.SELECT_PRODUCTS_PAGE,
+                (after_id if after_id is not None else 0, limit))
+            return [queries.row_to_product(row)
+                    for row in await cursor.fetchall()]
+
+    async def iter_products(self, batch_size: int = 1000
+                            ) -> AsyncIterator[Product]:
+        """Весь каталог через серверный курсор, как ProductManager."""
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor(name="products_stream") as cursor:
+                cursor.itersize = batch_size
+                await cursor.execute(queries.SELECT_ALL_PRODUCTS_ORDERED)
+                async for row in cursor:
+                    yield queries.row_to_product(row)
+
+    async def get_products_page_columns(
+            self, limit: int, after: Optional[Tuple[int, Any]] = None,
+            product_filter: Optional[ProductFilter] = None
+    ) -> ProductColumns:
+        query, params = queries.select_products_sql(
+            queries.PRODUCT_COLUMNS_CENTS, product_filter or ProductFilter(),
+            after, limit)
+        columns = ProductColumns()
+        async with get_async_pool().connection() as conn:
+            cursor = await conn.execute(query, params)
+            columns.extend_rows(await cursor.fetchall())
+        return columns
+
+    async def iter_product_columns(
+            self, batch_size: int = 1000,
+            product_filter: Optional[ProductFilter] = None
+    ) -> AsyncIterator[ProductColumns]:
+        query, params = queries.select_products_sql(
+            queries.PRODUCT_COLUMNS_CENTS, product_filter or ProductFilter())
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor(name="products_columns_stream") as cursor:
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    columns = ProductColumns()
+                    columns.extend_rows(rows)
+                    yield columns
+
+    async def export_products(self, export_format: str,
+                              is_active: Optional[bool] = None
+                              ) -> AsyncIterator[bytes]:
+        """COPY ... TO STDOUT порциями ~COPY_CHUNK_SIZE байт."""
+        copy_sql = queries.export_sql(export_format, is_active)
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cursor:
+                async with cursor.copy(copy_sql) as copy:
+                    chunk = bytearray()
+                    async for data in copy:
+                        chunk += data
+                        if len(chunk) >= COPY_CHUNK_SIZE:
+                            yield bytes(chunk)
+                            chunk.clear()
+                    if chunk:
+                        yield bytes(chunk)
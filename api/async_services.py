@@ -0,0 +1,101 @@
+# api/async_services.py
+# Асинхронный клиент сервиса скидок для ASGI-варианта API.
+# Таймауты, пул и предохранитель настраиваются так же, как в services.py.
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from circuit_breaker import CircuitBreaker
+from metrics import observe_stage
+from services import (DISCOUNT_SERVICE_URL, DISCOUNT_CONNECT_TIMEOUT,
+                      DISCOUNT_READ_TIMEOUT, DISCOUNT_RETRIES,
+                      DISCOUNT_POOL_SIZE, DISCOUNT_BREAKER_FAILURES,
+                      DISCOUNT_BREAKER_RESET)
+
+_client: Optional[httpx.AsyncClient] = None
+discount_breaker = CircuitBreaker(failure_threshold=DISCOUNT_BREAKER_FAILURES,
+                                  reset_timeout=DISCOUNT_BREAKER_RESET)
+_counters: Dict[str, int] = {"requests": 0, "errors": 0, "fallbacks": 0}
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Общий keep-alive клиент; создаётся лениво внутри event loop."""
+    global _client
+    if _client is None:
+        limits = httpx.Limits(max_connections=DISCOUNT_POOL_SIZE,
+                              max_keepalive_connections=DISCOUNT_POOL_SIZE)
+        _client = httpx.AsyncClient(
+            base_url=DISCOUNT_SERVICE_URL,
+            timeout=httpx.Timeout(DISCOUNT_READ_TIMEOUT,
+                                  connect=DISCOUNT_CONNECT_TIMEOUT),
+            # httpx повторяет только ошибки установки соединения
+            transport=httpx.AsyncHTTPTransport(retries=DISCOUNT_RETRIES,
+                                               limits=limits))
+    return _client
+
+
+async def close_async_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _call_discount_service(method: str, path: str,
+                                 **kwargs: Any) -> Optional[Dict[str, Any]]:
+    if not discount_breaker.allow_request():
+        _counters["fallbacks"] += 1
+        return None
+    _counters["requests"] += 1
+    try:
+        with observe_stage("discount_call"):
+            response = await get_async_client().request(method, path,
+                                                        **kwargs)
+        if response.status_code == 200 or response.status_code == 201:
+            discount_breaker.record_success()
+            return response.json()
+        print(f"Discount service error: {response.status_code}")
+        if response.status_code >= 500:
+            discount_breaker.record_failure()
+        else:
+            discount_breaker.record_success()
+    except httpx.HTTPError as e:
+        print(f"Connection error to discount service: {e}")
+        discount_breaker.record_failure()
+    _counters["errors"] += 1
+    _counters["fallbacks"] += 1
+    return None
+
+
+async def get_discount(price: Decimal, coupon_code: str) -> Decimal:
+    discount_data = await _call_discount_service(
+        "GET", "/product_discount",
+        params={"price": str(price), "coupon_code": coupon_code})
+    if discount_data is None:
+        return Decimal(str(price))
+    return Decimal(str(discount_data['price']))
+
+
+async def get_discount_multiplier(coupon_code: str) -> Decimal:
+    """См. services.get_discount_multiplier."""
+    return await get_discount(Decimal('1'), coupon_code)
+
+
+async def get_discounts(
+        items: Sequence[Tuple[Decimal, Optional[str]]]) -> List[Decimal]:
+    if not items:
+        return []
+    discount_data = await _call_discount_service(
+        "POST", "/product_discounts",
+        json={"items": [{"price": str(price), "coupon_code": coupon_code}
+                        for price, coupon_code in items]})
+    if discount_data is None:
+        return [Decimal(str(price)) for price, _ in items]
+    return [Decimal(str(new_price)) for new_price in discount_data['prices']]
+
+
+def discount_client_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = dict(_counters)
+    stats["breaker"] = discount_breaker.stats()
+    return stats
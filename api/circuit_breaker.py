@@ -0,0 +1,82 @@
+# api/circuit_breaker.py
+from typing import Any, Dict
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Простой автомат "предохранитель" для вызовов внешнего сервиса.
+    closed    - запросы идут как обычно, считаем ошибки подряд;
+    open      - после failure_threshold ошибок запросы не отправляются
+                reset_timeout секунд, вызывающий сразу берёт запасной вариант;
+    half_open - по истечении паузы пропускаем один пробный запрос:
+                успех закрывает предохранитель, ошибка снова открывает.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        # Счётчики для статистики
+        self.opens = 0
+        self.half_opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Можно ли сейчас обращаться к сервису."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self.half_opens += 1
+                self._probe_in_flight = False
+            # half_open: пропускаем только один пробный запрос
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or \
+                    self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opens += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opens": self.opens,
+                "half_opens": self.half_opens,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,100 @@
+# api/copy_stream.py
+from typing import Iterator, List
+import queue
+import threading
+
+from database import get_db_connection
+
+# Размер порции, которую отдаём в HTTP-ответ (байты)
+COPY_CHUNK_SIZE = 64 * 1024
+# Сколько порций может ждать отправки: ограничивает память на один экспорт
+COPY_QUEUE_CHUNKS = 8
+
+_DONE = object()
+
+
+class _ExportCancelled(Exception):
+    """Клиент ушёл, COPY нужно прервать."""
+
+
+class _QueueWriter:
+    """Файлоподобный объект для copy_expert: складывает порции в очередь."""
+
+    def __init__(self, chunks: "queue.Queue[object]",
+                 cancelled: threading.Event) -> None:
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer: List[bytes] = []
+        self._size = 0
+
+    def write(self, data: bytes) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+        self._buffer.append(data)
+        self._size += len(data)
+        if self._size >= COPY_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        chunk = b"".join(self._buffer)
+        self._buffer, self._size = [], 0
+        # Очередь ограничена: если клиент читает медленно, COPY ждёт
+        while True:
+            if self._cancelled.is_set():
+                raise _ExportCancelled()
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+def stream_copy_to(copy_sql: str) -> Iterator[bytes]:
+    """
+    Выполняет COPY ... TO STDOUT в отдельном потоке и отдаёт результат
+    порциями. copy_expert пишет синхронно, поэтому между ним и HTTP-ответом
+    стоит ограниченная очередь: память не зависит от размера выгрузки.
+    """
+    chunks: "queue.Queue[object]" = queue.Queue(maxsize=COPY_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    errors: List[BaseException] = []
+
+    def run_copy() -> None:
+        writer = _QueueWriter(chunks, cancelled)
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.copy_expert(copy_sql, writer)
+            writer.flush()
+        except _ExportCancelled:
+            pass
+        except BaseException as e:
+            if not cancelled.is_set():
+                errors.append(e)
+        finally:
+            while True:
+                try:
+                    chunks.put(_DONE, timeout=0.1)
+                    break
+                except queue.Full:
+                    if cancelled.is_set():
+                        break
+
+    thread = threading.Thread(target=run_copy, name="copy-export",
+                              daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                break
+            yield item  # type: ignore[misc]
+        if errors:
+            raise errors[0]
+    finally:
+        cancelled.set()
+        thread.join()
+
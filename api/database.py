@@ -1,7 +1,17 @@
 from psycopg2.extensions import connection as connection_type
+from psycopg2.extensions import cursor as cursor_type
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 import psycopg2
+import re
+import threading
+import time
 import os
 
+from metrics import observe_stage, observe_stage_seconds
+from slow_queries import slow_query_log
+
 # Параметры БД
 DB_HOST = os.environ.get("DB_HOST", "db")
 DB_NAME = os.environ.get("DB_NAME", "te"
@@ -9,8 +19,340 @@ DB_NAME = os.environ.get("DB_NAME", "te"
 DB_USER = os.environ.get("DB_USER", "user")
 DB_PASS = os.environ.get("DB_PASS", "password")
 
+# Параметры пула соединений
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+# Сколько секунд запрос ждёт свободное соединение, прежде чем получить ошибку
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "5"))
+# Соединение, пролежавшее в пуле дольше этого времени, проверяется SELECT 1
+DB_POOL_CHECK_IDLE = float(os.environ.get("DB_POOL_CHECK_IDLE", "10"))
+# Частые запросы ProductManager выполняются как PREPARE/EXECUTE (0 - выкл.)
+DB_PREPARED_STATEMENTS = os.environ.get("DB_PREPARED_STATEMENTS", "1") == "1"
+
+
+class PreparingConnection(connection_type):
+    """Соединение psycopg2, помнящее свои подготовленные операторы."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.prepared: Set[str] = set()
+
+
+# EXPLAIN медленного запроса под SAVEPOINT: ошибка EXPLAIN не должна
+# ломать транзакцию, в которой выполнялся исходный запрос
+EXPLAIN_PREFIX = "EXPLAIN (ANALYZE, BUFFERS) "
+
+
+def explain_query(conn: connection_type, query: Any, vars: Any) -> str:
+    in_transaction = conn.info.transaction_status != TRANSACTION_STATUS_IDLE
+    # Простой курсор, а не TimedCursor: EXPLAIN не попадает в журнал
+    with cursor_type(conn) as cursor:
+        if in_transaction:
+            cursor.execute("SAVEPOINT slow_query_explain;")
+        try:
+            cursor.execute(EXPLAIN_PREFIX + query, vars)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except psycopg2.Error as e:
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain;")
+            return f"EXPLAIN failed: {e}".strip()
+        if in_transaction:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain;")
+        else:
+            conn.rollback()  # Закрываем транзакцию, открытую EXPLAIN
+    return plan
+
+
+class TimedCursor(cursor_type):
+    """
+    Курсор пула: время каждого запроса идёт в этап "db" метрик и в
+    журнал медленных запросов (slow_queries.py), для части медленных
+    SELECT дополнительно снимается EXPLAIN.
+    """
+
+    def execute(self, query: Any, vars: Any = None) -> None:
+        started = time.perf_counter()
+        try:
+            super().execute(query, vars)
+        finally:
+            seconds = time.perf_counter() - started
+            observe_stage_seconds("db", seconds)
+        if slow_query_log.track(query, seconds):
+            plan = None
+            if self.name is None and slow_query_log.wants_explain(query):
+                plan = explain_query(self.connection, query, vars)
+            slow_query_log.record(query, vars, seconds, plan)
+
+    def executemany(self, query: Any, vars_list: Any) -> None:
+        started = time.perf_counter()
+        try:
+            super().executemany(query, vars_list)
+        finally:
+            seconds = time.perf_counter() - started
+            observe_stage_seconds("db", seconds)
+        if slow_query_log.track(query, seconds):
+            slow_query_log.record(query, None, seconds)
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        if size is None:
+            size = self.arraysize
+        if self.name is None:
+            # Обычный курсор уже получил все строки в execute
+            return super().fetchmany(size)
+        with observe_stage("db"):
+            return super().fetchmany(size)
+
+
+class PreparedStatement:
+    """
+    Оператор с плейсхолдерами %s, который на каждом соединении один раз
+    регистрируется через PREPARE, а дальше выполняется через EXECUTE:
+    Postgres не разбирает и не планирует его заново на каждый запрос.
+    """
+
+    def __init__(self, name: str, sql: str) -> None:
+        self.name = name
+        self.sql = sql
+        self.param_count = sql.count("%s")
+        # %s -> $1, $2, ... в порядке появления
+        numbers = iter(range(1, self.param_count + 1))
+        body = re.sub(r"%s", lambda _: f"${next(numbers)}",
+                      sql.rstrip().rstrip(";"))
+        self.prepare_sql = f"PREPARE {name} AS {body};"
+        self.execute_sql = (f"EXECUTE {name}"
+                            + (" (" + ", ".join(["%s"] * self.param_count)
+                               + ")" if self.param_count else "") + ";")
+
+
+def execute_prepared(cursor: cursor_type, statement: PreparedStatement,
+                     params: Sequence[Any] = (),
+                     prepared: bool = True) -> None:
+    """
+    cursor.execute через подготовленный оператор. Без prepared (или на
+    соединении не из пула) - обычный запрос с тем же текстом.
+    PREPARE не транзакционный: откат не удаляет оператор.
+    """
+    conn = cursor.connection
+    if not prepared or not isinstance(conn, PreparingConnection):
+        cursor.execute(statement.sql, params)
+        return
+    if statement.name not in conn.prepared:
+        cursor.execute(statement.prepare_sql)
+        conn.prepared.add(statement.name)
+    cursor.execute(statement.execute_sql, params)
+
+
+class PoolTimeoutError(Exception):
+    """Свободное соединение не появилось за DB_POOL_TIMEOUT секунд."""
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений psycopg2 с ограничением размера.
+    Соединения выдаются в порядке LIFO, чтобы "горячие" соединения
+    переиспользовались, а лишние могли спокойно простаивать.
+    """
+
+    def __init__(self, min_size: int = DB_POOL_MIN,
+                 max_size: int = DB_POOL_MAX,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 check_idle: float = DB_POOL_CHECK_IDLE) -> None:
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: min=%s max=%s"
+                             % (min_size, max_size))
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._cond = threading.Condition()
+        # Свободные соединения вместе с моментом возврата в пул
+        self._idle: List[Tuple[connection_type, float]] = []
+        self._size = 0  # Всего открытых соединений (свободные + выданные)
+        self._in_use = 0
+        self._waiting = 0
+        # Статистика
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self) -> connection_type:
+        return psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER,
+                                password=DB_PASS,
+                                connection_factory=PreparingConnection,
+                                cursor_factory=TimedCursor)
+
+    def warm_up(self) -> None:
+        """Открывает min_size соединений заранее (ошибки не критичны)."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except psycopg2.OperationalError:
+                with self._cond:
+                    self._size -= 1
+                return
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _is_healthy(self, conn: connection_type, returned_at: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_idle:
+            return True
+        # Давно не использовалось: сервер мог закрыть соединение
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self) -> connection_type:
+        """Берёт соединение из пула, при необходимости открывая новое."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        conn: Optional[connection_type] = None
+        returned_at = 0.0
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # Резервируем место под новое
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        "No free database connection after %.1fs "
+                        "(max_size=%d)" % (self.timeout, self.max_size))
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            waited = time.monotonic() - started
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, returned_at):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._discarded += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            # Место в пуле освобождаем, иначе пул "усохнет"
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn: connection_type, discard: bool = False) -> None:
+        """Возвращает соединение в пул; сломанные соединения закрываются."""
+        if not discard and not conn.closed \
+                and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed:
+            self._close_quietly(conn)
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._discarded += 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._in_use -= 1
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn: connection_type) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(
+                    self._wait_time_total * 1000 / checkouts, 3)
+                if checkouts else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Пул создаётся лениво и заново после fork (например, в gunicorn)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool()
+                _pool_pid = os.getpid()
+                _pool.warm_up()
+    return _pool
+
 
-def get_db_connection() -> connection_type:
-    conn = psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER,
-                            password=DB_PASS)
-    return conn
+@contextmanager
+def get_db_connection() -> Iterator[connection_type]:
+    """
+    Выдаёт соединение из пула на время блока with.
+    Как и `with conn:` в psycopg2: коммит при успехе, откат при ошибке.
+    Соединение возвращается в пул в любом случае.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        raise
+    finally:
+        pool.putconn(conn)
@@ -0,0 +1,151 @@
+# api/http_utils.py
+# Общие для Flask- и ASGI-приложения части HTTP-контракта:
+# ETag, курсоры пагинации, разбор параметров запроса.
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+import base64
+import binascii
+import json
+
+from models import Product, ProductColumns, ProductFilter
+from queries import SORT_KEYS
+from serializers import format_cents
+
+
+def product_etag(product: Product) -> str:
+    return f"{product.id}-{product.version}"
+
+
+def catalog_etag(catalog_version: int) -> str:
+    return f"catalog-{catalog_version}"
+
+
+def version_from_etags(product_id: int, etags: Iterable[str]) -> Optional[int]:
+    """Версия строки из If-Match вида "<id>-<version>" (или None)."""
+    for etag in etags:
+        product_part, _, version_part = etag.rpartition("-")
+        if product_part == str(product_id) and version_part.isdigit():
+            return int(version_part)
+    return None
+
+
+def parse_bool_arg(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in ("true", "1", "yes"):
+        return True
+    if lowered in ("false", "0", "no"):
+        return False
+    raise ValueError(f"Invalid boolean: {value}")
+
+
+def encode_cursor(product_id: int, sort_value: Any = None) -> str:
+    """
+    Непрозрачный курсор для клиента: base64 от {"id": ...} и, при
+    сортировке не по id, значения колонки сортировки ("v").
+    """
+    data: Dict[str, Any] = {"id": product_id}
+    if sort_value is not None:
+        data["v"] = sort_value
+    raw = json.dumps(data).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, Any]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        product_id = data["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(product_id, int):
+        raise ValueError("Invalid cursor")
+    return product_id, data.get("v")
+
+
+def _cursor_sort_value(sort: str, value: Any) -> Any:
+    # Значение из курсора должно подходить к текущей сортировке
+    column = sort.lstrip("-")
+    if column == "id":
+        return None
+    if column == "price" and isinstance(value, str):
+        try:
+            return Decimal(value)
+        except InvalidOperation:
+            pass
+    elif column == "name" and isinstance(value, str):
+        return value
+    raise ValueError("Invalid cursor")
+
+
+def parse_page_args(args: Mapping[str, Any], max_limit: int,
+                    sort: str = "id"
+                    ) -> Optional[Tuple[int, Optional[Tuple[int, Any]]]]:
+    """
+    limit/after из query string. None - пагинация не запрошена (поток).
+    after - (id, значение колонки sort) последней строки прошлой страницы.
+    Ошибки формата - ValueError с текстом для клиента.
+    """
+    limit_str = args.get('limit')
+    cursor = args.get('after')
+    if limit_str is None and cursor is None:
+        return None
+    limit = max_limit
+    if limit_str is not None:
+        try:
+            limit = int(limit_str)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1 or limit > max_limit:
+            raise ValueError(f"limit must be between 1 and {max_limit}")
+    after: Optional[Tuple[int, Any]] = None
+    if cursor:
+        after_id, value = decode_cursor(cursor)
+        after = (after_id, _cursor_sort_value(sort, value))
+    return limit, after
+
+
+def _parse_price_arg(args: Mapping[str, Any], name: str) -> Optional[Decimal]:
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a valid number")
+    if not price.is_finite():
+        raise ValueError(f"{name} must be a valid number")
+    return price
+
+
+def parse_product_filter(args: Mapping[str, Any]) -> ProductFilter:
+    """
+    Фильтры GET /products: is_active, min_price, max_price,
+    name_prefix (начало имени), name (подстрока) и sort.
+    Ошибки формата - ValueError с текстом для клиента.
+    """
+    is_active: Optional[bool] = None
+    if args.get('is_active') is not None:
+        try:
+            is_active = parse_bool_arg(args['is_active'])
+        except ValueError:
+            raise ValueError("is_active must be true or false")
+    sort = args.get('sort') or "id"
+    if sort not in SORT_KEYS:
+        raise ValueError("sort must be one of: " + ", ".join(SORT_KEYS))
+    return ProductFilter(is_active=is_active,
+                         min_price=_parse_price_arg(args, 'min_price'),
+                         max_price=_parse_price_arg(args, 'max_price'),
+                         name_prefix=args.get('name_prefix') or None,
+                         name_contains=args.get('name') or None,
+                         sort=sort)
+
+
+def next_page_cursor(columns: ProductColumns, sort: str) -> str:
+    """Курсор после последней строки страницы для данной сортировки."""
+    column = sort.lstrip("-")
+    sort_value: Any = None
+    if column == "price":
+        sort_value = format_cents(columns.price_cents[-1])
+    elif column == "name":
+        sort_value = columns.names[-1]
+    return encode_cursor(columns.ids[-1], sort_value)
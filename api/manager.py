@@ -1,9 +1,53 @@
 # api/manager.py
-from database import get_db_connection
-from models import Product
-from services import get_discount
+from database import (get_db_connection, execute_prepared,
+                      PreparedStatement, DB_PREPARED_STATEMENTS)
+from copy_stream import stream_copy_to
+from models import Product, ProductColumns, ProductFilter
+import queries
+from cache import LRUCache
+from services import get_discount, get_discounts, get_discount_multiplier
 from dataclasses import replace
-from typing import Optional, List, Dict, Any
+from psycopg2.extras import execute_values
+import csv
+import io
+import os
+from typing import Optional, List, Dict, Any, Iterator, Sequence, Tuple
+from decimal import Decimal
+
+# С какого размера пакета импорт идёт через COPY, а не multi-row INSERT
+BULK_COPY_THRESHOLD = int(os.environ.get("BULK_COPY_THRESHOLD", "500"))
+
+
+# Частые запросы: PREPARE один раз на соединение пула, дальше EXECUTE
+GET_PRODUCT = PreparedStatement("product_by_id", queries.SELECT_PRODUCT_BY_ID)
+INSERT_PRODUCT = PreparedStatement("product_insert", queries.INSERT_PRODUCT)
+UPDATE_PRODUCT = PreparedStatement("product_update",
+                                   queries.update_product_sql(False))
+UPDATE_PRODUCT_VERSIONED = PreparedStatement(
+    "product_update_versioned", queries.update_product_sql(True))
+GET_PRODUCT_VERSION = PreparedStatement("product_version",
+                                        queries.SELECT_PRODUCT_VERSION)
+DELETE_PRODUCT = PreparedStatement("product_delete", queries.DELETE_PRODUCT)
+GET_CATALOG_VERSION = PreparedStatement("catalog_version",
+                                        queries.SELECT_CATALOG_VERSION)
+
+
+class VersionConflictError(Exception):
+    """Строка изменилась с момента, когда клиент её прочитал."""
+
+    def __init__(self, product_id: int, current_version: int) -> None:
+        super().__init__(f"Product {product_id} is at version "
+                         f"{current_version}")
+        self.product_id = product_id
+        self.current_version = current_version
+
+
+class CouponNotFoundError(Exception):
+    """Купона с таким кодом нет в таблице coupons."""
+
+    def __init__(self, coupon_code: str) -> None:
+        super().__init__(f"Coupon {coupon_code!r} not found")
+        self.coupon_code = coupon_code
 
 
 class ProductManager:
@@ -12,34 +56,90 @@ class ProductManager:
     Использует ООП подход вместо набора функций.
     """
 
+    def __init__(self, cache: Optional[LRUCache[Product]] = None,
+                 prepared: bool = DB_PREPARED_STATEMENTS) -> None:
+        # Необязательный кэш продуктов по id (read-through)
+        self.cache = cache
+        # Выполнять частые запросы как подготовленные операторы
+        self.prepared = prepared
+
+    def _execute(self, cursor: Any, statement: PreparedStatement,
+                 params: Sequence[Any]) -> None:
+        execute_prepared(cursor, statement, params, self.prepared)
+
+    def _invalidate(self, product_id: int) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(product_id)
+
     def get_product_by_id(self, product_id: int) -> Optional[Product]:
-        """Получает продукт по ID."""
+        """Получает продукт по ID (через кэш, если он включён)."""
+        if self.cache is None:
+            return self._fetch_product(product_id)
+        product = self.cache.get(product_id)
+        if product is None:
+            product = self._fetch_product(product_id)
+            if product is not None:
+                self.cache.put(product_id, product)
+        return product
+
+    def _fetch_product(self, product_id: int) -> Optional[Product]:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, name, price, is_active, original_price FROM products WHERE id = %s;",
-                    (product_id,))
+                self._execute(cursor, GET_PRODUCT, (product_id,))
                 result = cursor.fetchone()
                 if result is None:
                     return None
                 # Используем Product DTO вместо сырого кортежа
-                return Product(id=result[0], name=result[1], price=result[2],
-                               is_active=result[3], original_price=result[4])
+                return queries.row_to_product(result)
 
     def add_product(self, product: Product) -> int:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO products (name, price, is_active, original_price) VALUES (%s, %s, %s, %s) RETURNING id;",
+                self._execute(
+                    cursor, INSERT_PRODUCT,
                     (product.name, product.price, product.is_active,
-                     product.original_price)
-                )
+                     product.original_price))
                 result = cursor.fetchone()
                 if result is None:
                     raise Exception("Failed to retrieve new product ID.")
                 new_id=result[0]
                 conn.commit()
-                return new_id
+        self._invalidate(new_id)
+        return new_id
+
+    def add_products(self, products: List[Product]) -> List[int]:
+        """
+        Пакетная вставка в одной транзакции; id возвращаются в порядке
+        products. id заранее берутся из последовательности одним запросом,
+        поэтому соответствие строка -> id не зависит от порядка RETURNING.
+        Маленькие пакеты - multi-row INSERT, большие - COPY FROM STDIN.
+        """
+        if not products:
+            return []
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(queries.NEXT_PRODUCT_IDS, (len(products),))
+                new_ids = [row[0] for row in cursor.fetchall()]
+                if len(products) < BULK_COPY_THRESHOLD:
+                    execute_values(
+                        cursor,
+                        queries.INSERT_PRODUCTS_WITH_IDS,
+                        [(new_id, p.name, p.price, p.is_active,
+                          p.original_price)
+                         for new_id, p in zip(new_ids, products)],
+                        page_size=len(products))
+                else:
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    for new_id, p in zip(new_ids, products):
+                        writer.writerow((new_id, p.name, p.price,
+                                         "t" if p.is_active else "f",
+                                         p.original_price))
+                    buffer.seek(0)
+                    cursor.copy_expert(queries.COPY_PRODUCTS_FROM_STDIN,
+                                       buffer)
+                conn.commit()
+        return new_ids
 
     def _apply_discount_logic(self, product: Product,
                               coupon_code: str) -> Product:
@@ -50,53 +150,226 @@ class ProductManager:
             final_price = product.original_price
         return replace(product, price=final_price)
 
+    def _price_update_args(self, price: Any, coupon_code: Optional[str]
+                           ) -> Tuple[Optional[Decimal], Decimal]:
+        """
+        Аргументы для price = COALESCE(%s, original_price * %s).
+        Без купона цена берётся из запроса; с купоном (или пустым купоном)
+        считается от original_price прямо в UPDATE, поэтому читать строку
+        заранее не нужно. Логика та же, что в _apply_discount_logic.
+        """
+        if coupon_code:
+            return None, get_discount_multiplier(coupon_code)
+        if coupon_code == "":
+            return None, Decimal('1')
+        return Decimal(str(price)), Decimal('1')
+
     def update_product(self, product_id: int,
-                       update_data: Dict[str, Any]) -> bool:
-        existing_product = self.get_product_by_id(product_id)
-        if existing_product is None:
-            return False  # Продукт не найден
-        updated_product = existing_product
-        coupon_code = update_data.pop('coupon_code',
-                                      None)
-        updated_product = replace(existing_product, **update_data)
-        final_product = self._apply_discount_logic(updated_product, coupon_code)
+                       update_data: Dict[str, Any],
+                       expected_version: Optional[int] = None
+                       ) -> Optional[Product]:
+        """
+        Обновляет продукт одним UPDATE ... RETURNING.
+        expected_version включает оптимистическую блокировку: если строка
+        уже изменилась, бросается VersionConflictError.
+        Возвращает обновлённый продукт или None, если его нет.
+        """
+        coupon_code = update_data.get('coupon_code')
+        # Скидку считаем до UPDATE, чтобы не держать транзакцию во время HTTP
+        price, multiplier = self._price_update_args(update_data['price'],
+                                                    coupon_code)
+        statement = UPDATE_PRODUCT
+        params: List[Any] = [update_data['name'], update_data['is_active'],
+                             price, multiplier, product_id]
+        if expected_version is not None:
+            statement = UPDATE_PRODUCT_VERSIONED
+            params.append(expected_version)
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                self._execute(cursor, statement, params)
+                result = cursor.fetchone()
+                if result is None and expected_version is not None:
+                    # Отличаем "нет продукта" от "версия устарела"
+                    self._execute(cursor, GET_PRODUCT_VERSION,
+                                  (product_id,))
+                    current = cursor.fetchone()
+                    if current is not None:
+                        raise VersionConflictError(product_id, current[0])
+                conn.commit()
+        self._invalidate(product_id)
+        if result is None:
+            return None  # Продукт не найден
+        return queries.row_to_product(result)
+
+    def apply_coupon_to_products(self, product_ids: List[int],
+                                 coupon_code: str) -> int:
+        """
+        Применяет купон сразу к нескольким продуктам: одно чтение,
+        один пакетный запрос к сервису скидок и одно UPDATE.
+        Возвращает количество обновлённых продуктов.
+        """
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
-                    "UPDATE products SET name = %s, price = %s, is_active = %s, original_price = %s WHERE id = %s;",
-                    (final_product.name, final_product.price,
-                     final_product.is_active, final_product.original_price,
-                     product_id)
-                )
+                    "SELECT id, original_price FROM products WHERE id = ANY(%s) FOR UPDATE;",
+                    (list(product_ids),))
+                rows = cursor.fetchall()
+                if not rows:
+                    return 0
+                if coupon_code:
+                    new_prices = get_discounts(
+                        [(original_price, coupon_code)
+                         for _, original_price in rows])
+                else:
+                    # Пустой купон - возврат к исходной цене
+                    new_prices = [original_price for _, original_price in rows]
+                execute_values(
+                    cursor,
+                    "UPDATE products SET price = v.price FROM (VALUES %s) AS v (id, price) WHERE products.id = v.id;",
+                    [(product_id, new_price) for (product_id, _), new_price
+                     in zip(rows, new_prices)],
+                    template="(%s::int, %s::numeric)")
                 conn.commit()
+        for product_id, _ in rows:
+            self._invalidate(product_id)
+        return len(rows)
 
-        return True
+    def _invalidate_filtered(self, product_filter: ProductFilter) -> None:
+        # После массового UPDATE: точечно по ids или весь кэш
+        if self.cache is None:
+            return
+        if product_filter.ids is not None:
+            for product_id in product_filter.ids:
+                self.cache.invalidate(product_id)
+        else:
+            self.cache.clear()
+
+    def apply_campaign(self, coupon_code: str,
+                       product_filter: ProductFilter) -> int:
+        """
+        Переоценивает все продукты под фильтром по купону одним UPDATE
+        ... FROM coupons (формула make_discount считается в SQL, без
+        вызовов сервиса скидок). Возвращает число изменённых строк.
+        """
+        query, params = queries.apply_campaign_sql(coupon_code,
+                                                   product_filter)
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                updated = cursor.rowcount
+                if updated == 0:
+                    # 0 строк: либо всё уже переоценено, либо нет купона
+                    cursor.execute(queries.SELECT_COUPON_EXISTS,
+                                   (coupon_code,))
+                    if cursor.fetchone() is None:
+                        raise CouponNotFoundError(coupon_code)
+        self._invalidate_filtered(product_filter)
+        return updated
+
+    def revert_campaign(self, product_filter: ProductFilter) -> int:
+        """Возвращает продуктам под фильтром original_price одним UPDATE."""
+        query, params = queries.revert_campaign_sql(product_filter)
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                updated = cursor.rowcount
+        self._invalidate_filtered(product_filter)
+        return updated
 
     def delete_product(self, product_id: int) -> bool:
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(
-                    "DELETE FROM products WHERE id = %s;", (product_id,)
-                )
+                self._execute(cursor, DELETE_PRODUCT, (product_id,))
                 conn.commit()
-                return True
+        self._invalidate(product_id)
+        return True
 
     def get_all_products(self) -> List[Product]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(queries.SELECT_ALL_PRODUCTS)
+                return [queries.row_to_product(row)
+                        for row in cursor.fetchall()]
+
+    def get_catalog_version(self) -> int:
+        """Глобальный счётчик изменений каталога (триггер на products)."""
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                self._execute(cursor, GET_CATALOG_VERSION, ())
+                result = cursor.fetchone()
+                return result[0] if result is not None else 0
+
+    def get_products_page(self, limit: int,
+                          after_id: Optional[int] = None) -> List[Product]:
+        """
+        Страница каталога по ключу id (keyset): WHERE id > after_id.
+        В отличие от OFFSET стоимость не растёт с номером страницы.
+        """
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
-                    "SELECT id, name, price, is_active, original_price FROM products;")
-                result = cursor.fetchall()
-                products: List[Product] = []
-                for items in result:
-                    id_val, name_val, price_val, is_active_val, \
-                    original_price_val = items
-                    # Используем dataclass для создания объекта
-                    products.append(Product(
-                        id=id_val,
-                        name=name_val,
-                        price=price_val,
-                        is_active=is_active_val,
-                        original_price=original_price_val
-                    ))
-                return products
+                    queries.SELECT_PRODUCTS_PAGE,
+                    (after_id if after_id is not None else 0, limit))
+                return [queries.row_to_product(row)
+                        for row in cursor.fetchall()]
+
+    def iter_products(self, batch_size: int = 1000) -> Iterator[Product]:
+        """
+        Потоково отдаёт весь каталог через серверный (именованный) курсор:
+        в памяти одновременно не больше batch_size строк.
+        Соединение из пула занято, пока генератор не исчерпан или не закрыт.
+        """
+        with get_db_connection() as conn:
+            with conn.cursor(name="products_stream") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(queries.SELECT_ALL_PRODUCTS_ORDERED)
+                for row in cursor:
+                    yield queries.row_to_product(row)
+
+    def get_products_page_columns(
+            self, limit: int, after: Optional[Tuple[int, Any]] = None,
+            product_filter: Optional[ProductFilter] = None
+    ) -> ProductColumns:
+        """
+        Страница каталога в колоночном виде (без объекта на строку)
+        с фильтрами и сортировкой; after - keyset-курсор (id, значение
+        колонки сортировки) последней строки предыдущей страницы.
+        """
+        query, params = queries.select_products_sql(
+            queries.PRODUCT_COLUMNS_CENTS, product_filter or ProductFilter(),
+            after, limit)
+        columns = ProductColumns()
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                columns.extend_rows(cursor.fetchall())
+        return columns
+
+    def iter_product_columns(self, batch_size: int = 1000,
+                             product_filter: Optional[ProductFilter] = None
+                             ) -> Iterator[ProductColumns]:
+        """
+        Весь (отфильтрованный) каталог пачками по batch_size строк
+        в колоночном виде через серверный курсор (как iter_products).
+        """
+        query, params = queries.select_products_sql(
+            queries.PRODUCT_COLUMNS_CENTS, product_filter or ProductFilter())
+        with get_db_connection() as conn:
+            with conn.cursor(name="products_columns_stream") as cursor:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    columns = ProductColumns()
+                    columns.extend_rows(rows)
+                    yield columns
+
+    def export_products(self, export_format: str,
+                        is_active: Optional[bool] = None) -> Iterator[bytes]:
+        """
+        Выгрузка каталога через COPY (SELECT ...) TO STDOUT порциями байт.
+        export_format: "csv" (с заголовком) или "ndjson" (объект на строку,
+        цены строками как в API).
+        """
+        return stream_copy_to(queries.export_sql(export_format, is_active))
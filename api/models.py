@@ -1,20 +1,83 @@
 # api/models.py
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 
-@dataclass
+# slots + frozen: без __dict__ на каждый экземпляр, и объект можно
+# безопасно отдавать из кэша нескольким запросам сразу
+@dataclass(frozen=True, slots=True)
 class Product:
     name: str
     price: Decimal
     original_price: Decimal
     id: Optional[int] = None  # ID может быть None при создании
     is_active: bool = True
+    version: Optional[int] = None  # Версия строки в БД, основа ETag
 
 
-
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Coupon:
     code: str
     discount_percent: float
+
+
+@dataclass(frozen=True, slots=True)
+class ProductFilter:
+    """Фильтры и сортировка списка продуктов (GET /products)."""
+    is_active: Optional[bool] = None
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+    name_prefix: Optional[str] = None
+    name_contains: Optional[str] = None
+    sort: str = "id"  # Ключ из queries.SORT_KEYS, "-" - по убыванию
+    ids: Optional[Tuple[int, ...]] = None  # Только эти id (кампании)
+
+
+def cents_to_decimal(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+
+@dataclass(slots=True)
+class ProductColumns:
+    """
+    Колоночное представление списка продуктов: параллельные массивы
+    вместо объекта на строку. Цены хранятся в копейках (int64), флаги
+    байтами, поэтому на строку приходится по 8 байт на число, а не
+    отдельный объект Decimal. Порядок строк общий для всех массивов.
+    """
+    ids: "array[int]" = field(default_factory=lambda: array('q'))
+    names: List[str] = field(default_factory=list)
+    price_cents: "array[int]" = field(default_factory=lambda: array('q'))
+    original_price_cents: "array[int]" = field(
+        default_factory=lambda: array('q'))
+    is_active: "array[int]" = field(default_factory=lambda: array('b'))
+    versions: "array[int]" = field(default_factory=lambda: array('q'))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Строки (id, name, price_cents, is_active, original_price_cents,
+        version) - порядок queries.PRODUCT_COLUMNS_CENTS."""
+        for row in rows:
+            self.ids.append(row[0])
+            self.names.append(row[1])
+            self.price_cents.append(row[2])
+            self.is_active.append(row[3])
+            self.original_price_cents.append(row[4])
+            self.versions.append(row[5])
+
+    def iter_rows(self) -> Iterator[Tuple[int, str, int, bool, int, int]]:
+        return zip(self.ids, self.names, self.price_cents,
+                   map(bool, self.is_active), self.original_price_cents,
+                   self.versions)
+
+    def product(self, index: int) -> Product:
+        return Product(id=self.ids[index], name=self.names[index],
+                       price=cents_to_decimal(self.price_cents[index]),
+                       original_price=cents_to_decimal(
+                           self.original_price_cents[index]),
+                       is_active=bool(self.is_active[index]),
+                       version=self.versions[index])
@@ -0,0 +1,208 @@
+# api/queries.py
+# SQL для работы с продуктами. Общий для синхронного (psycopg2) и
+# асинхронного (psycopg 3) менеджеров: оба используют плейсхолдеры %s.
+from typing import Any, List, Optional, Sequence, Tuple
+
+from models import Product, ProductFilter
+
+PRODUCT_COLUMNS = "id, name, price, is_active, original_price, version"
+
+# Для колоночного режима (models.ProductColumns): цены сразу в копейках,
+# чтобы не создавать Decimal на каждую строку
+PRODUCT_COLUMNS_CENTS = (
+    "id, name, (price * 100)::bigint, is_active, "
+    "(original_price * 100)::bigint, version")
+
+SELECT_PRODUCT_BY_ID = (
+    f"SELECT {PRODUCT_COLUMNS} FROM products WHERE id = %s;")
+
+INSERT_PRODUCT = (
+    "INSERT INTO products (name, price, is_active, original_price) "
+    "VALUES (%s, %s, %s, %s) RETURNING id;")
+
+# id для пакетной вставки берутся из последовательности заранее
+NEXT_PRODUCT_IDS = (
+    "SELECT nextval(pg_get_serial_sequence('products', 'id')) "
+    "FROM generate_series(1, %s);")
+
+INSERT_PRODUCTS_WITH_IDS = (
+    "INSERT INTO products (id, name, price, is_active, original_price) "
+    "VALUES %s;")
+
+COPY_PRODUCTS_FROM_STDIN = (
+    "COPY products (id, name, price, is_active, original_price) "
+    "FROM STDIN WITH (FORMAT csv);")
+
+# Текстовый формат COPY: строки передаются через write_row (psycopg 3)
+COPY_PRODUCT_ROWS_FROM_STDIN = (
+    "COPY products (id, name, price, is_active, original_price) FROM STDIN;")
+
+SELECT_PRODUCT_VERSION = "SELECT version FROM products WHERE id = %s;"
+
+DELETE_PRODUCT = "DELETE FROM products WHERE id = %s;"
+
+SELECT_CATALOG_VERSION = "SELECT version FROM catalog_version;"
+
+SELECT_PRODUCTS_PAGE = (
+    f"SELECT {PRODUCT_COLUMNS} FROM products "
+    "WHERE id > %s ORDER BY id LIMIT %s;")
+
+SELECT_ALL_PRODUCTS = f"SELECT {PRODUCT_COLUMNS} FROM products;"
+
+SELECT_ALL_PRODUCTS_ORDERED = (
+    f"SELECT {PRODUCT_COLUMNS} FROM products ORDER BY id;")
+
+
+def update_product_sql(with_version: bool) -> str:
+    """
+    UPDATE одной командой: цена либо из запроса, либо от original_price
+    по множителю купона. С with_version - оптимистическая блокировка.
+    """
+    return ("UPDATE products SET name = %s, is_active = %s, "
+            "price = COALESCE(%s, original_price * %s) WHERE id = %s"
+            + (" AND version = %s" if with_version else "")
+            + f" RETURNING {PRODUCT_COLUMNS};")
+
+
+# sort -> (колонка, направление). Ключ keyset-пагинации - (колонка, id),
+# поэтому порядок однозначен и при одинаковых ценах/именах
+SORT_KEYS = {
+    "id": ("id", "ASC"), "-id": ("id", "DESC"),
+    "price": ("price", "ASC"), "-price": ("price", "DESC"),
+    "name": ("name", "ASC"), "-name": ("name", "DESC"),
+}
+
+
+def _like_pattern(value: str, prefix_only: bool) -> str:
+    # Экранируем спецсимволы LIKE (экранирующий символ по умолчанию - \)
+    escaped = (value.replace("\\", "\\\\").replace("%", "\\%")
+               .replace("_", "\\_"))
+    return escaped + "%" if prefix_only else "%" + escaped + "%"
+
+
+def filter_conditions(product_filter: ProductFilter,
+                      table: str = "products"
+                      ) -> Tuple[List[str], List[Any]]:
+    """Условия WHERE (через AND) и их параметры для ProductFilter."""
+    conditions: List[str] = []
+    params: List[Any] = []
+    if product_filter.ids is not None:
+        conditions.append(f"{table}.id = ANY(%s)")
+        params.append(list(product_filter.ids))
+    if product_filter.is_active is not None:
+        conditions.append(f"{table}.is_active = %s")
+        params.append(product_filter.is_active)
+    if product_filter.min_price is not None:
+        conditions.append(f"{table}.price >= %s")
+        params.append(product_filter.min_price)
+    if product_filter.max_price is not None:
+        conditions.append(f"{table}.price <= %s")
+        params.append(product_filter.max_price)
+    if product_filter.name_prefix:
+        conditions.append(f"{table}.name ILIKE %s")
+        params.append(_like_pattern(product_filter.name_prefix, True))
+    if product_filter.name_contains:
+        conditions.append(f"{table}.name ILIKE %s")
+        params.append(_like_pattern(product_filter.name_contains, False))
+    return conditions, params
+
+
+def select_products_sql(columns: str, product_filter: ProductFilter,
+                        after: Optional[Tuple[int, Any]] = None,
+                        limit: Optional[int] = None
+                        ) -> Tuple[str, List[Any]]:
+    """
+    SELECT списка продуктов с фильтрами, сортировкой и keyset-курсором
+    after = (id, значение колонки сортировки) последней строки страницы.
+    Все значения передаются параметрами. Индексы: (is_active, price) и
+    триграммный GIN по name (см. init.sql).
+    """
+    conditions, params = filter_conditions(product_filter)
+
+    column, direction = SORT_KEYS[product_filter.sort]
+    if after is not None:
+        after_id, after_value = after
+        op = ">" if direction == "ASC" else "<"
+        if column == "id":
+            conditions.append(f"id {op} %s")
+            params.append(after_id)
+        else:
+            conditions.append(f"({column}, id) {op} (%s, %s)")
+            params.extend((after_value, after_id))
+
+    sql = f"SELECT {columns} FROM products"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if column == "id":
+        sql += f" ORDER BY id {direction}"
+    else:
+        sql += f" ORDER BY {column} {direction}, id {direction}"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql + ";", params
+
+
+# Та же формула, что make_discount в discount_service:
+# original_price * (1 - процент / 100), при проценте <= 0 - без скидки
+CAMPAIGN_PRICE = ("CASE WHEN c.discount_percent > 0 THEN "
+                  "products.original_price * (1 - c.discount_percent / 100) "
+                  "ELSE products.original_price END")
+
+SELECT_COUPON_EXISTS = "SELECT 1 FROM coupons WHERE code = %s;"
+
+
+def apply_campaign_sql(coupon_code: str, product_filter: ProductFilter
+                       ) -> Tuple[str, List[Any]]:
+    """
+    Переоценка всех подходящих продуктов одним UPDATE ... FROM coupons.
+    Строки, где цена уже совпадает с новой, не трогаются (без лишних
+    версий и WAL).
+    """
+    conditions, filter_params = filter_conditions(product_filter)
+    params: List[Any] = [coupon_code] + filter_params
+    sql = (f"UPDATE products SET price = {CAMPAIGN_PRICE} FROM coupons c "
+           f"WHERE c.code = %s AND products.price IS DISTINCT FROM "
+           f"({CAMPAIGN_PRICE})::numeric(10, 2)")
+    for condition in conditions:
+        sql += " AND " + condition
+    return sql + ";", params
+
+
+def revert_campaign_sql(product_filter: ProductFilter
+                        ) -> Tuple[str, List[Any]]:
+    """Возврат подходящих продуктов к original_price одним UPDATE."""
+    conditions, params = filter_conditions(product_filter)
+    sql = ("UPDATE products SET price = original_price "
+           "WHERE price <> original_price")
+    for condition in conditions:
+        sql += " AND " + condition
+    return sql + ";", params
+
+
+def export_sql(export_format: str, is_active: Optional[bool]) -> str:
+    """
+    COPY (SELECT ...) TO STDOUT для выгрузки. COPY не принимает параметры,
+    поэтому фильтр подставляется литералом (только TRUE/FALSE).
+    """
+    where = ""
+    if is_active is not None:
+        where = "WHERE is_active = " + ("TRUE" if is_active else "FALSE")
+    if export_format == "csv":
+        return (f"COPY (SELECT {PRODUCT_COLUMNS} FROM products {where} "
+                "ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER true);")
+    if export_format == "ndjson":
+        # CSV с символами-разделителями, которых не бывает в JSON:
+        # так COPY не экранирует обратные слэши внутри строк JSON
+        return ("COPY (SELECT row_to_json(t) FROM (SELECT id, name, "
+                "price::text AS price, is_active, "
+                "original_price::text AS original_price, version "
+                f"FROM products {where} ORDER BY id) t) TO STDOUT "
+                "WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02');")
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+def row_to_product(row: Sequence[Any]) -> Product:
+    """Строка в порядке PRODUCT_COLUMNS -> Product DTO."""
+    return Product(id=row[0], name=row[1], price=row[2], is_active=row[3],
+                   original_price=row[4], version=row[5])
@@ -0,0 +1,109 @@
+# api/serializers.py
+# Сериализация продуктов в JSON-байты для ответов API.
+# Цены всегда строки с двумя знаками ("100.00") во всех эндпоинтах.
+# Если установлен orjson, он используется вместо стандартного json.
+import json
+import os
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from metrics import timed_stage
+from models import Product, ProductColumns
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен
+    orjson = None
+
+# JSON_BACKEND=json принудительно включает стандартный модуль
+JSON_BACKEND = os.environ.get(
+    "JSON_BACKEND", "orjson" if orjson is not None else "json")
+
+CENT = Decimal('0.01')
+
+
+def format_price(value: Any) -> str:
+    """Цена строкой с двумя знаками; округление как у NUMERIC в PostgreSQL."""
+    if type(value) is not Decimal:
+        value = Decimal(str(value))
+    text = str(value)
+    # NUMERIC(10, 2) из БД уже в нужном виде: проверка по строке дешевле
+    # as_tuple(), а quantize нужен только для вычисленных цен
+    if len(text) > 3 and text[-3] == ".":
+        return text
+    return str(value.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def product_to_dict(product: Product) -> Dict[str, Any]:
+    return {"id": product.id, "name": product.name,
+            "price": format_price(product.price),
+            "original_price": format_price(product.original_price),
+            "is_active": product.is_active, "version": product.version}
+
+
+def product_row_to_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    """Строка в порядке queries.PRODUCT_COLUMNS -> словарь для JSON."""
+    return {"id": row[0], "name": row[1], "price": format_price(row[2]),
+            "original_price": format_price(row[4]),
+            "is_active": row[3], "version": row[5]}
+
+
+if JSON_BACKEND == "orjson" and orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+
+@timed_stage("serialization")
+def serialize_product(product: Product) -> bytes:
+    return dumps(product_to_dict(product))
+
+
+@timed_stage("serialization")
+def serialize_products(products: Iterable[Product]) -> bytes:
+    return dumps([product_to_dict(p) for p in products])
+
+
+@timed_stage("serialization")
+def serialize_product_rows(rows: Iterable[Sequence[Any]]) -> bytes:
+    """JSON-массив прямо из строк БД, без промежуточных Product."""
+    return dumps([product_row_to_dict(row) for row in rows])
+
+
+def format_cents(cents: int) -> str:
+    """Копейки -> "123.45" (то же, что format_price для NUMERIC(10, 2))."""
+    if cents < 0:
+        return "-" + format_cents(-cents)
+    text = str(cents) if cents >= 100 else f"{cents:03d}"
+    return text[:-2] + "." + text[-2:]
+
+
+def columns_to_dicts(columns: ProductColumns) -> List[Dict[str, Any]]:
+    return [{"id": id_, "name": name, "price": format_cents(price),
+             "original_price": format_cents(original_price),
+             "is_active": is_active, "version": version}
+            for id_, name, price, is_active, original_price, version
+            in columns.iter_rows()]
+
+
+@timed_stage("serialization")
+def serialize_columns(columns: ProductColumns) -> bytes:
+    return dumps(columns_to_dicts(columns))
+
+
+def iter_columns_json(batches: Iterable[ProductColumns]) -> Iterator[bytes]:
+    """
+    Один JSON-массив из последовательности пачек (для потоковой отдачи):
+    каждая пачка кодируется целиком и склеивается без скобок.
+    """
+    yield b"["
+    separator = b""
+    for columns in batches:
+        if len(columns):
+            yield separator + serialize_columns(columns)[1:-1]
+            separator = b","
+    yield b"]"
@@ -1,26 +1,124 @@
 from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from circuit_breaker import CircuitBreaker
+from metrics import observe_stage
 
 DISCOUNT_SERVICE_URL = os.environ.get("DISCOUNT_SERVICE_URL",
                                       "http://localhost:5001")
+# Таймауты (секунды): медленный сервис скидок не должен держать воркер Flask
+DISCOUNT_CONNECT_TIMEOUT = float(
+    os.environ.get("DISCOUNT_CONNECT_TIMEOUT", "0.5"))
+DISCOUNT_READ_TIMEOUT = float(os.environ.get("DISCOUNT_READ_TIMEOUT", "2"))
+# Сколько раз повторяем запрос при сетевой ошибке или 502/503/504
+DISCOUNT_RETRIES = int(os.environ.get("DISCOUNT_RETRIES", "1"))
+# Максимум keep-alive соединений к сервису скидок
+DISCOUNT_POOL_SIZE = int(os.environ.get("DISCOUNT_POOL_SIZE", "20"))
+# После стольких ошибок подряд перестаём ходить в сервис на reset_timeout
+DISCOUNT_BREAKER_FAILURES = int(
+    os.environ.get("DISCOUNT_BREAKER_FAILURES", "5"))
+DISCOUNT_BREAKER_RESET = float(os.environ.get("DISCOUNT_BREAKER_RESET", "30"))
 
 
-def get_discount(price: Decimal, coupon_code: str) -> Decimal:
+def _create_session() -> requests.Session:
+    """Общая сессия: соединения к сервису скидок переиспользуются."""
+    retry = Retry(total=DISCOUNT_RETRIES, connect=DISCOUNT_RETRIES,
+                  read=DISCOUNT_RETRIES, status=DISCOUNT_RETRIES,
+                  backoff_factor=0.05, status_forcelist=(502, 503, 504),
+                  allowed_methods=frozenset(["GET", "POST"]),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DISCOUNT_POOL_SIZE,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = _create_session()
+discount_breaker = CircuitBreaker(failure_threshold=DISCOUNT_BREAKER_FAILURES,
+                                  reset_timeout=DISCOUNT_BREAKER_RESET)
+_counters: Dict[str, int] = {"requests": 0, "errors": 0, "fallbacks": 0}
+
+
+def _call_discount_service(method: str, path: str,
+                           **kwargs: Any) -> Optional[Dict[str, Any]]:
+    """
+    Запрос к сервису скидок через общую сессию и предохранитель.
+    Возвращает JSON ответа или None - тогда вызывающий берёт исходную цену.
+    """
+    if not discount_breaker.allow_request():
+        # Предохранитель открыт: в сервис не ходим
+        _counters["fallbacks"] += 1
+        return None
+    _counters["requests"] += 1
     try:
-        response = requests.get(
-            f"{DISCOUNT_SERVICE_URL}/product_discount?price={price}&coupon_code={coupon_code}")
+        with observe_stage("discount_call"):
+            response = _session.request(
+                method, f"{DISCOUNT_SERVICE_URL}{path}",
+                timeout=(DISCOUNT_CONNECT_TIMEOUT, DISCOUNT_READ_TIMEOUT),
+                **kwargs)
         if response.status_code == 200 or response.status_code == 201:
-            discount_data = response.json()
-            # Возвращаем новую цену из ответа
-            new_price = discount_data['price']
-            return Decimal(str(new_price))
+            discount_breaker.record_success()
+            return response.json()
+        # Обработка ошибки, если сервис скидок недоступен или вернул ошибку
+        print(f"Discount service error: {response.status_code}")
+        if response.status_code >= 500:
+            discount_breaker.record_failure()
         else:
-            # Обработка ошибки, если сервис скидок недоступен или вернул ошибку
-            print(f"Discount service error: {response.status_code}")
-            return Decimal(
-                str(price))  # Возвращаем оригинальную цену по умолчанию
+            discount_breaker.record_success()  # Сервис жив, ошибка в данных
     except requests.exceptions.RequestException as e:
         print(f"Connection error to discount service: {e}")
-        return Decimal(
-            str(price))  # Возвращаем оригинальную цену в случае сетевой ошибки
+        discount_breaker.record_failure()
+    _counters["errors"] += 1
+    _counters["fallbacks"] += 1
+    return None
+
+
+def get_discount(price: Decimal, coupon_code: str) -> Decimal:
+    discount_data = _call_discount_service(
+        "GET", "/product_discount",
+        params={"price": str(price), "coupon_code": coupon_code})
+    if discount_data is None:
+        # Возвращаем оригинальную цену, если сервис скидок недоступен
+        return Decimal(str(price))
+    # Возвращаем новую цену из ответа
+    return Decimal(str(discount_data['price']))
+
+
+def get_discount_multiplier(coupon_code: str) -> Decimal:
+    """
+    Множитель цены для купона: цена 1 -> (100 - процент) / 100.
+    Позволяет посчитать цену прямо в UPDATE (original_price * множитель)
+    без предварительного чтения строки. При недоступности сервиса - 1,
+    то есть исходная цена, как и в get_discount.
+    """
+    return get_discount(Decimal('1'), coupon_code)
+
+
+def get_discounts(
+        items: Sequence[Tuple[Decimal, Optional[str]]]) -> List[Decimal]:
+    """
+    Пакетный вариант get_discount: пары (цена, купон) -> новые цены
+    в том же порядке за один HTTP-запрос.
+    """
+    if not items:
+        return []
+    discount_data = _call_discount_service(
+        "POST", "/product_discounts",
+        json={"items": [{"price": str(price), "coupon_code": coupon_code}
+                        for price, coupon_code in items]})
+    if discount_data is None:
+        return [Decimal(str(price)) for price, _ in items]
+    return [Decimal(str(new_price)) for new_price in discount_data['prices']]
+
+
+def discount_client_stats() -> Dict[str, Any]:
+    """Счётчики клиента сервиса скидок для /debug/stats."""
+    stats: Dict[str, Any] = dict(_counters)
+    stats["breaker"] = discount_breaker.stats()
+    return stats
@@ -0,0 +1,125 @@
+# api/slow_queries.py
+# Журнал медленных запросов: время каждого оператора (агрегаты по тексту
+# SQL) и последние запросы дольше порога - с формой параметров (типы и
+# размеры, без значений) и, для части SELECT, планом EXPLAIN (ANALYZE,
+# BUFFERS). Заполняется курсорами из database.py / async_database.py,
+# отдаётся через /debug/slow-queries.
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import os
+import random
+import threading
+import time
+
+# Порог "медленного" запроса, миллисекунды
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+# Доля медленных SELECT, для которых снимается EXPLAIN ANALYZE (0 - никогда).
+# ANALYZE выполняет запрос повторно, поэтому только SELECT и только выборка
+SLOW_QUERY_EXPLAIN_SAMPLE = float(
+    os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+# Сколько последних медленных запросов хранить
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "100"))
+# Ограничение числа разных текстов SQL в агрегатах
+SLOW_QUERY_MAX_STATEMENTS = 500
+
+
+def param_shape(params: Any) -> Any:
+    """Типы параметров без значений: "int", "str(12)", "list[3]"..."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: _value_shape(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [_value_shape(value) for value in params]
+    return _value_shape(params)
+
+
+def _value_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def _query_text(query: Any) -> str:
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    return query if isinstance(query, str) else str(query)
+
+
+class SlowQueryLog:
+    """Потокобезопасный журнал; все методы дешёвые, кроме EXPLAIN."""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS,
+                 explain_sample: float = SLOW_QUERY_EXPLAIN_SAMPLE,
+                 size: int = SLOW_QUERY_LOG_SIZE) -> None:
+        self.threshold = threshold_ms / 1000
+        self.explain_sample = explain_sample
+        self._lock = threading.Lock()
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=size)
+        # sql -> [count, total_seconds, max_seconds, slow_count]
+        self._statements: Dict[str, List[float]] = {}
+
+    def track(self, query: Any, seconds: float) -> bool:
+        """Учитывает выполнение; True, если запрос медленный."""
+        sql = _query_text(query)
+        if not sql.strip():
+            return False  # Проверка соединения пулом psycopg 3
+        slow = seconds >= self.threshold
+        with self._lock:
+            entry = self._statements.get(sql)
+            if entry is None:
+                if len(self._statements) >= SLOW_QUERY_MAX_STATEMENTS:
+                    return slow
+                entry = self._statements[sql] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            if slow:
+                entry[3] += 1
+        return slow
+
+    def wants_explain(self, query: Any) -> bool:
+        if self.explain_sample <= 0:
+            return False
+        if not _query_text(query).lstrip().upper().startswith("SELECT"):
+            return False
+        return random.random() < self.explain_sample
+
+    def record(self, query: Any, params: Any, seconds: float,
+               plan: Optional[str] = None) -> None:
+        entry = {"at": time.time(), "duration_ms": round(seconds * 1000, 3),
+                 "sql": _query_text(query), "params": param_shape(params),
+                 "plan": plan}
+        with self._lock:
+            self._slow.append(entry)
+        print(f"Slow query ({entry['duration_ms']} ms): {entry['sql']} "
+              f"params={entry['params']}")
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            slow = list(self._slow)
+            statements = [
+                {"sql": sql, "count": int(count),
+                 "total_ms": round(total * 1000, 3),
+                 "avg_ms": round(total * 1000 / count, 3),
+                 "max_ms": round(max_seconds * 1000, 3),
+                 "slow_count": int(slow_count)}
+                for sql, (count, total, max_seconds, slow_count)
+                in self._statements.items()]
+        statements.sort(key=lambda s: s["total_ms"], reverse=True)
+        return {"threshold_ms": self.threshold * 1000,
+                "explain_sample": self.explain_sample,
+                "slow": slow[::-1],  # Сначала новые
+                "statements": statements[:top]}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slow.clear()
+            self._statements.clear()
+
+
+slow_query_log = SlowQueryLog()
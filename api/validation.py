@@ -0,0 +1,163 @@
+# api/validation.py
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+
+from models import Product, ProductFilter
+
+# products.price и original_price - DECIMAL(10, 2)
+MAX_PRICE = Decimal("99999999.99")
+
+
+def validate_new_product(data: Any) -> Tuple[Optional[Product], Optional[str]]:
+    """
+    Проверяет данные нового продукта (POST /product и /products/bulk).
+    Возвращает (Product, None) или (None, текст ошибки).
+    """
+    if not isinstance(data, dict):
+        return None, "Product must be a JSON object"
+    name = data.get('name')
+    price_str = data.get('price')
+    if not name or not price_str:
+        return None, "Missing name or price"
+    if not isinstance(name, str) or len(name) > 100 or len(name) < 1:
+        return None, "Invalid name"
+    try:
+        price_decimal = Decimal(str(price_str))
+        if price_decimal < 0:
+            return None, "Price must be positive"
+    except InvalidOperation:
+        return None, "Price must be a valid number"
+    if not price_decimal.is_finite() or price_decimal > MAX_PRICE:
+        return None, "Price must be a valid number"
+    is_active = data.get('is_active', True)
+    if not isinstance(is_active, bool):
+        return None, "is_active must be a boolean"
+
+    return Product(name=name, price=price_decimal, is_active=is_active,
+                   original_price=price_decimal), None
+
+
+def validate_product_update(data: Any
+                            ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Проверяет тело PUT /product/<id>.
+    Возвращает (update_data для ProductManager.update_product, None)
+    или (None, текст ошибки).
+    """
+    if not isinstance(data, dict):
+        return None, "Product must be a JSON object"
+    name = data.get('name')
+    price_str = data.get('price')
+
+    if not name or not price_str:
+        return None, "Missing name or price"
+    if not isinstance(name, str) or len(name) > 100 or len(name) < 1:
+        return None, "Invalid name length (1-100)"
+
+    try:
+        Decimal(str(price_str))
+    except InvalidOperation:
+        return None, "Price must be a valid number"
+
+    return {
+        'name': name,
+        'price': price_str,  # Отправляем как строку
+        'is_active': data.get('is_active', True),
+        'coupon_code': data.get('coupon_code', None)
+    }, None
+
+
+def _campaign_price(filter_data: Dict[str, Any], name: str
+                    ) -> Tuple[Optional[Decimal], Optional[str]]:
+    value = filter_data.get(name)
+    if value is None:
+        return None, None
+    if isinstance(value, bool):
+        return None, f"{name} must be a valid number"
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        return None, f"{name} must be a valid number"
+    if not price.is_finite():
+        return None, f"{name} must be a valid number"
+    return price, None
+
+
+def validate_campaign_filter(data: Any
+                             ) -> Tuple[Optional[ProductFilter], Optional[str]]:
+    """
+    Фильтр кампании из {"filter": {"ids": [...], "is_active": true,
+    "min_price": "10", "max_price": "100"}}; без filter - весь каталог.
+    Возвращает (ProductFilter, None) или (None, текст ошибки).
+    """
+    if not isinstance(data, dict):
+        return None, "Body must be a JSON object"
+    filter_data = data.get('filter', {})
+    if not isinstance(filter_data, dict):
+        return None, "filter must be a JSON object"
+    unknown = set(filter_data) - {'ids', 'is_active', 'min_price',
+                                  'max_price'}
+    if unknown:
+        return None, "Unknown filter fields: " + ", ".join(sorted(unknown))
+
+    ids = filter_data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not all(
+                isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return None, "ids must be a list of integers"
+        ids = tuple(ids)
+    is_active = filter_data.get('is_active')
+    if is_active is not None and not isinstance(is_active, bool):
+        return None, "is_active must be a boolean"
+    min_price, error = _campaign_price(filter_data, 'min_price')
+    if error is None:
+        max_price, error = _campaign_price(filter_data, 'max_price')
+    if error is not None:
+        return None, error
+    return ProductFilter(ids=ids, is_active=is_active, min_price=min_price,
+                         max_price=max_price), None
+
+
+def validate_campaign(data: Any) -> Tuple[Optional[Tuple[str, ProductFilter]],
+                                          Optional[str]]:
+    """Тело POST /campaigns/apply: coupon_code и необязательный filter."""
+    product_filter, error = validate_campaign_filter(data)
+    if product_filter is None:
+        return None, error
+    coupon_code = data.get('coupon_code')
+    if not isinstance(coupon_code, str) or not coupon_code:
+        return None, "Missing coupon_code"
+    return (coupon_code, product_filter), None
+
+
+def parse_ndjson(lines: Iterable[bytes]) -> List[Any]:
+    """NDJSON -> список строк; нечитаемая строка превращается в None."""
+    rows: List[Any] = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            rows.append(None)  # Ошибку покажем для этой строки
+    return rows
+
+
+def split_bulk_rows(rows: List[Any]
+                    ) -> Tuple[List[Product], List[int], List[Dict[str, Any]]]:
+    """
+    Делит строки импорта на валидные продукты (с их индексами во входных
+    данных) и ошибки вида {"index": i, "error": "..."}.
+    """
+    valid_products: List[Product] = []
+    valid_indexes: List[int] = []
+    errors: List[Dict[str, Any]] = []
+    for index, row in enumerate(rows):
+        product, error = validate_new_product(row)
+        if product is None:
+            errors.append({"index": index, "error": error})
+        else:
+            valid_products.append(product)
+            valid_indexes.append(index)
+    return valid_products, valid_indexes, errors
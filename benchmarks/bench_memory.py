@@ -0,0 +1,94 @@
+# benchmarks/bench_memory.py
+# Память под список продуктов в разных представлениях.
+# Запуск: python benchmarks/bench_memory.py [--rows 1000000]
+# Сравнивает прежний @dataclass (с __dict__), slotted/frozen models.Product,
+# кортежи строк БД и колоночный models.ProductColumns.
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+from models import Product, ProductColumns  # noqa: E402
+
+
+@dataclass
+class DictProduct:
+    # Прежнее определение models.Product (до slots/frozen)
+    name: str
+    price: Decimal
+    original_price: Decimal
+    id: Optional[int] = None
+    is_active: bool = True
+    version: Optional[int] = None
+
+
+def make_name(i: int) -> str:
+    # Имена и цены создаются заново для каждой строки, как их отдаёт драйвер
+    return f"Product {i}"
+
+
+def build_dataclass(rows: int) -> Any:
+    return [DictProduct(id=i, name=make_name(i),
+                        price=Decimal(f"{i % 1000}.50"), is_active=True,
+                        original_price=Decimal(f"{i % 1000}.99"), version=1)
+            for i in range(rows)]
+
+
+def build_slotted(rows: int) -> Any:
+    return [Product(id=i, name=make_name(i),
+                    price=Decimal(f"{i % 1000}.50"), is_active=True,
+                    original_price=Decimal(f"{i % 1000}.99"), version=1)
+            for i in range(rows)]
+
+
+def build_tuples(rows: int) -> Any:
+    return [(i, make_name(i), Decimal(f"{i % 1000}.50"), True,
+             Decimal(f"{i % 1000}.99"), 1)
+            for i in range(rows)]
+
+
+def build_columns(rows: int) -> Any:
+    # Строки как из queries.PRODUCT_COLUMNS_CENTS: цены уже в копейках
+    columns = ProductColumns()
+    columns.extend_rows((i, make_name(i), (i % 1000) * 100 + 50, True,
+                         (i % 1000) * 100 + 99, 1)
+                        for i in range(rows))
+    return columns
+
+
+def measure(build: Callable[[int], Any], rows: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    cases = [("dataclass (__dict__)", build_dataclass),
+             ("Product (slots, frozen)", build_slotted),
+             ("row tuples", build_tuples),
+             ("ProductColumns", build_columns)]
+    print(f"{args.rows} rows")
+    baseline = None
+    for name, build in cases:
+        size = measure(build, args.rows)
+        baseline = baseline or size
+        print(f"{name:26} {size / 2 ** 20:8.1f} MiB "
+              f"{size / args.rows:7.1f} B/row {size / baseline:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
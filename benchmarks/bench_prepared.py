@@ -0,0 +1,82 @@
+# benchmarks/bench_prepared.py
+# Время ProductManager на запрос с подготовленными операторами и без.
+# Запуск (нужна БД из init.sql; параметры - DB_HOST/DB_NAME/...):
+#   python benchmarks/bench_prepared.py [--requests 5000]
+# Нагрузка повторяет locustfile.py: POST /product с именем TestLoadItem_N,
+# а к нему добавлены чтение, обновление и удаление того же товара.
+# Сервис скидок не вызывается (обновление без купона).
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+from database import get_pool  # noqa: E402
+from manager import ProductManager  # noqa: E402
+from models import Product  # noqa: E402
+
+
+def run(manager: ProductManager, requests: int,
+        seed: int) -> Dict[str, List[float]]:
+    rng = random.Random(seed)
+    timings: Dict[str, List[float]] = {}
+
+    def timed(name: str, call: Callable[[], object]) -> object:
+        started = time.perf_counter()
+        result = call()
+        timings.setdefault(name, []).append(time.perf_counter() - started)
+        return result
+
+    for _ in range(requests):
+        item_id = rng.randint(1, 100000)
+        product = Product(name=f"TestLoadItem_{item_id}",
+                          price=Decimal("50.00"),
+                          original_price=Decimal("50.00"))
+        product_id = timed("add_product",
+                           lambda: manager.add_product(product))
+        timed("get_product_by_id",
+              lambda: manager.get_product_by_id(product_id))
+        timed("update_product",
+              lambda: manager.update_product(
+                  product_id, {"name": product.name, "price": "45.00",
+                               "is_active": True}))
+        timed("get_catalog_version", manager.get_catalog_version)
+        timed("delete_product", lambda: manager.delete_product(product_id))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Открываем соединения заранее, чтобы не мерить подключение
+    get_pool()
+    results = {}
+    for prepared in (False, True, False, True):
+        # Два прохода в чередовании сглаживают прогрев кэшей Postgres
+        timings = run(ProductManager(prepared=prepared), args.requests,
+                      seed=42)
+        results.setdefault(prepared, {})
+        for name, values in timings.items():
+            results[prepared].setdefault(name, []).extend(values)
+
+    print(f"{args.requests} iterations x 2, per call (us): "
+          "mean / p95, plain -> prepared")
+    for name in results[False]:
+        plain, prepared = results[False][name], results[True][name]
+        p95 = [statistics.quantiles(v, n=20)[-1] * 1e6
+               for v in (plain, prepared)]
+        means = [statistics.fmean(v) * 1e6 for v in (plain, prepared)]
+        print(f"{name:22} {means[0]:8.1f} -> {means[1]:8.1f} "
+              f"({(means[1] / means[0] - 1) * 100:+5.1f}%)   "
+              f"p95 {p95[0]:8.1f} -> {p95[1]:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
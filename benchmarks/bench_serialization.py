@@ -0,0 +1,85 @@
+# benchmarks/bench_serialization.py
+# Стоимость сериализации списка продуктов на одну строку.
+# Запуск: python benchmarks/bench_serialization.py [--rows 100000]
+# Сравнивает прежний путь (jsonify(p.__dict__) через JSON-провайдер Flask)
+# с serializers.py на стандартном json и на orjson (если установлен).
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+import serializers  # noqa: E402
+from models import Product, ProductColumns  # noqa: E402
+from queries import row_to_product  # noqa: E402
+
+
+def make_rows(count: int) -> List[Tuple[Any, ...]]:
+    # Строки в порядке PRODUCT_COLUMNS, цены как их отдаёт psycopg2
+    return [(i, f"Product {i}", Decimal(f"{i % 1000}.{i % 100:02d}"),
+             i % 3 != 0, Decimal(f"{i % 1000 + 1}.00"), 1)
+            for i in range(1, count + 1)]
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    products: List[Product] = [row_to_product(row) for row in rows]
+    # Прежний путь брал готовый product.__dict__, поэтому словари
+    # строятся заранее и в замер не входят
+    dicts = [{"id": r[0], "name": r[1], "price": r[2], "is_active": r[3],
+              "original_price": r[4], "version": r[5]} for r in rows]
+    columns = ProductColumns()
+    columns.extend_rows((r[0], r[1], int(r[2] * 100), r[3],
+                         int(r[4] * 100), r[5]) for r in rows)
+
+    from flask import Flask
+    flask_app = Flask(__name__)
+
+    def flask_default() -> bytes:
+        with flask_app.app_context():
+            return flask_app.json.dumps(dicts).encode("utf-8")
+
+    cases = [("flask jsonify(__dict__)", flask_default)]
+    backends = ["json"] + (["orjson"] if serializers.orjson else [])
+    for backend in backends:
+        if backend == "orjson":
+            dumps = serializers.orjson.dumps
+        else:
+            dumps = serializers.json.JSONEncoder(
+                ensure_ascii=False, separators=(",", ":")).encode
+        cases.append((f"{backend}: products",
+                      lambda d=dumps: d([serializers.product_to_dict(p)
+                                         for p in products])))
+        cases.append((f"{backend}: rows",
+                      lambda d=dumps: d([serializers.product_row_to_dict(r)
+                                         for r in rows])))
+        cases.append((f"{backend}: columns",
+                      lambda d=dumps: d(serializers.columns_to_dicts(
+                          columns))))
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for name, func in cases:
+        elapsed = best_of(func, args.repeat)
+        print(f"{name:28} {elapsed * 1000:9.1f} ms total "
+              f"{elapsed / args.rows * 1e6:7.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 # discount_service/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 import psycopg2
 import os
+import time
 from decimal import Decimal, InvalidOperation
 import requests
+from coupon_cache import CouponCache
+from metrics import observe_stage, record_request, metrics_payload
 
 app = Flask(__name__)
 
@@ -19,11 +22,51 @@ def get_db_connection():
     return conn
 
 
+# Таблица купонов в памяти процесса, обновляется через LISTEN/NOTIFY
+coupon_cache = CouponCache(get_db_connection)
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    rule = request.url_rule.rule if request.url_rule is not None \
+        else "<unmatched>"
+    if started is not None and rule != '/metrics':
+        record_request(request.method, rule, response.status_code,
+                       time.perf_counter() - started)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/debug/stats', methods=['GET'])
+def debug_stats():
+    return jsonify({"coupon_cache": coupon_cache.stats()}), 200
+
+
+def apply_discount(price_decimal: Decimal, discount_percent: Decimal) -> Decimal:
+    # >>>>> Корректный расчет новой цены
+    # Новая цена = Старая цена * (100 - процент скидки) / 100
+    if discount_percent > 0:
+        discount_multiplier = Decimal('1') - (discount_percent / Decimal('100'))
+        return price_decimal * discount_multiplier
+    return price_decimal
+
+
 @app.route('/product_discount', methods=['GET'])
 def make_discount():
     price = request.args.get('price')
@@ -35,25 +78,45 @@ def make_discount():
     except InvalidOperation:
         return jsonify({"error": "Price must be a valid number"}), 400
 
-    discount_percent = Decimal('0.00')  # По умолчанию скидки нет (0%)
+    # Процент из словаря в памяти (например, 10.00); 0% для неизвестного кода
+    with observe_stage("coupon_lookup"):
+        discount_percent = coupon_cache.get_discount_percent(coupon_code)
 
-    # >>>>> Используем правильный контекстный менеджер БД и параметризованный запрос
-    with get_db_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT discount_percent FROM coupons WHERE code = %s;", (coupon_code,))
-            result = cursor.fetchone()
+    new_price_decimal = apply_discount(price_decimal, discount_percent)
+    return jsonify({"status": "success", "price": new_price_decimal}), 200  # <-- 200 OK
 
-            if result is not None:
-                discount_percent = result[0]  # Получаем процент из БД (например, 10.00)
 
-    # >>>>> Корректный расчет новой цены
-    # Новая цена = Старая цена * (100 - процент скидки) / 100
-    if discount_percent > 0:
-        discount_multiplier = Decimal('1') - (discount_percent / Decimal('100'))
-        new_price_decimal = price_decimal * discount_multiplier
-    else:
-        new_price_decimal = price_decimal
-    return jsonify({"status": "success", "price": new_price_decimal}), 200  # <-- 200 OK
+@app.route('/product_discounts', methods=['POST'])
+def make_discounts():
+    """
+    Пакетный расчёт: {"items": [{"price": "100.00", "coupon_code": "SALE10"}, ...]}
+    Ответ: {"status": "success", "prices": [...]} в том же порядке.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return jsonify({"error": "Missing items list"}), 400
+
+    prices = []
+    coupon_codes = set()
+    for index, item in enumerate(items):
+        price = item.get('price') if isinstance(item, dict) else None
+        if price is None or price == "":
+            return jsonify({"error": "Missing price", "index": index}), 400
+        try:
+            prices.append(Decimal(str(price)))
+        except InvalidOperation:
+            return jsonify({"error": "Price must be a valid number",
+                            "index": index}), 400
+        coupon_codes.add(item.get('coupon_code'))
+
+    # Один поиск на каждый уникальный код купона
+    with observe_stage("coupon_lookup"):
+        percents = {code: coupon_cache.get_discount_percent(code)
+                    for code in coupon_codes}
+    new_prices = [apply_discount(price, percents[item.get('coupon_code')])
+                  for price, item in zip(prices, items)]
+    return jsonify({"status": "success", "prices": new_prices}), 200
 
 
 if __name__ == '__main__':
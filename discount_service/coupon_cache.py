@@ -0,0 +1,167 @@
+# discount_service/coupon_cache.py
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Optional
+import os
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import connection as connection_type
+
+# Канал, в который пишет триггер coupons_changed (см. init.sql)
+COUPONS_CHANNEL = "coupons_changed"
+# Полная перезагрузка таблицы на случай потерянных уведомлений (секунды)
+COUPON_RELOAD_INTERVAL = float(os.environ.get("COUPON_RELOAD_INTERVAL", "60"))
+# Пауза перед переподключением слушателя после ошибки БД
+COUPON_RETRY_DELAY = float(os.environ.get("COUPON_RETRY_DELAY", "2"))
+
+NO_DISCOUNT = Decimal('0.00')
+
+
+class CouponCache:
+    """
+    Вся таблица coupons в памяти процесса: {code: discount_percent}.
+    Таблица целиком, поэтому отсутствие кода в словаре - это уже
+    отрицательный ответ, и неизвестные купоны тоже не ходят в БД.
+    Фоновый поток слушает LISTEN coupons_changed и точечно обновляет
+    изменённые коды, а раз в COUPON_RELOAD_INTERVAL перечитывает всё.
+    """
+
+    def __init__(self, connect: Callable[[], connection_type],
+                 reload_interval: float = COUPON_RELOAD_INTERVAL,
+                 retry_delay: float = COUPON_RETRY_DELAY) -> None:
+        self._connect = connect
+        self.reload_interval = reload_interval
+        self.retry_delay = retry_delay
+        # Словарь целиком подменяется при полной перезагрузке,
+        # поэтому читатели не берут блокировку
+        self._coupons: Dict[str, Decimal] = {}
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stopped = threading.Event()
+        # Статистика (счётчики без блокировки - только для наблюдения)
+        self.hits = 0
+        self.negative_hits = 0
+        self.full_reloads = 0
+        self.notifications = 0
+        self.listener_errors = 0
+        self.last_reload_at: Optional[float] = None
+
+    def get_discount_percent(self, code: Optional[str]) -> Decimal:
+        """Процент скидки по коду купона; 0.00, если купона нет."""
+        if not self._loaded or self._thread_pid != os.getpid():
+            self._ensure_started()
+        percent = self._coupons.get(code) if code is not None else None
+        if percent is None:
+            self.negative_hits += 1
+            return NO_DISCOUNT
+        self.hits += 1
+        return percent
+
+    def _ensure_started(self) -> None:
+        with self._load_lock:
+            if not self._loaded:
+                # Первый запрос: читаем таблицу синхронно,
+                # чтобы не отвечать "без скидки" до старта слушателя
+                conn = self._connect()
+                try:
+                    self._reload_all(conn)
+                finally:
+                    conn.close()
+            if self._thread_pid != os.getpid():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._listen_forever, name="coupon-cache-listener",
+                    daemon=True)
+                self._thread_pid = os.getpid()
+                self._thread.start()
+
+    def _reload_all(self, conn: connection_type) -> None:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT code, discount_percent FROM coupons;")
+            coupons = {code: percent for code, percent in cursor.fetchall()}
+        if not conn.autocommit:
+            conn.rollback()
+        self._coupons = coupons
+        self._loaded = True
+        self.full_reloads += 1
+        self.last_reload_at = time.time()
+
+    def _refresh_codes(self, conn: connection_type,
+                       codes: Iterable[str]) -> None:
+        codes = list(codes)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT code, discount_percent FROM coupons "
+                "WHERE code = ANY(%s);", (codes,))
+            fresh = dict(cursor.fetchall())
+        coupons = dict(self._coupons)
+        for code in codes:
+            if code in fresh:
+                coupons[code] = fresh[code]
+            else:
+                coupons.pop(code, None)  # Купон удалён
+        self._coupons = coupons
+
+    def _listen_forever(self) -> None:
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {COUPONS_CHANNEL};")
+                # Пока слушателя не было, уведомления могли потеряться
+                self._reload_all(conn)
+                next_reload = time.monotonic() + self.reload_interval
+                while not self._stopped.is_set():
+                    timeout = max(0.0, next_reload - time.monotonic())
+                    readable, _, _ = select.select([conn], [], [], timeout)
+                    if readable:
+                        self._process_notifications(conn)
+                    if time.monotonic() >= next_reload:
+                        self._reload_all(conn)
+                        next_reload = time.monotonic() + self.reload_interval
+            except psycopg2.Error as e:
+                self.listener_errors += 1
+                print(f"Coupon cache listener error: {e}")
+                self._stopped.wait(self.retry_delay)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+    def _process_notifications(self, conn: connection_type) -> None:
+        conn.poll()
+        codes = set()
+        full_reload = False
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            self.notifications += 1
+            if notify.payload:
+                codes.add(notify.payload)
+            else:
+                full_reload = True  # TRUNCATE: перечитываем всё
+        if full_reload:
+            self._reload_all(conn)
+        elif codes:
+            self._refresh_codes(conn, codes)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._coupons),
+            "loaded": self._loaded,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "full_reloads": self.full_reloads,
+            "notifications": self.notifications,
+            "listener_errors": self.listener_errors,
+            "listener_alive": self._thread is not None
+            and self._thread.is_alive(),
+            "last_reload_at": self.last_reload_at,
+        }
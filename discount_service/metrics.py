@@ -0,0 +1,58 @@
+# discount_service/metrics.py
+# Метрики Prometheus: длительность запросов по маршруту/статусу и время
+# по этапам обработки (coupon_lookup). Та же схема, что в api/metrics.py.
+# Наблюдение - это поиск корзины гистограммы и инкремент под блокировкой,
+# поэтому без скрейпа /metrics накладные расходы - единицы микросекунд.
+import os
+from contextlib import nullcontext
+from typing import Any, ContextManager, Dict, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, Histogram,
+                               generate_latest)
+
+# METRICS_ENABLED=0 отключает сбор (эндпоинт /metrics остаётся)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route and status "
+    "(streamed responses: until the first byte)",
+    ["method", "route", "status"])
+
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Time spent in a processing stage: coupon_lookup",
+    ["stage"], buckets=STAGE_BUCKETS)
+
+# labels() ищет потомка под блокировкой; кэшируем найденных
+_stage_children: Dict[str, Any] = {}
+_request_children: Dict[Tuple[str, str, str], Any] = {}
+_NULL_CONTEXT = nullcontext()
+
+def observe_stage(stage: str) -> ContextManager[Any]:
+    """with observe_stage("db"): ... - время блока в гистограмму этапа."""
+    if not METRICS_ENABLED:
+        return _NULL_CONTEXT
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_LATENCY.labels(stage)
+    return child.time()
+
+
+def record_request(method: str, route: str, status: int,
+                   seconds: float) -> None:
+    if not METRICS_ENABLED:
+        return
+    key = (method, route, str(status))
+    child = _request_children.get(key)
+    if child is None:
+        child = _request_children[key] = REQUEST_LATENCY.labels(*key)
+    child.observe(seconds)
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Тело и Content-Type ответа /metrics."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
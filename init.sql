@@ -6,7 +6,8 @@ CREATE TABLE IF NOT EXISTS products (
     name VARCHAR(100) NOT NULL,
     price DECIMAL(10, 2) NOT NULL,
     is_active BOOLEAN DEFAULT TRUE,
-    original_price DECIMAL(10, 2) NOT NULL
+    original_price DECIMAL(10, 2) NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1 -- Растёт при каждом UPDATE строки (ETag)
 );
 
 -- Вставка тестовых данных
@@ -16,6 +17,13 @@ INSERT INTO products (name, price, is_active, original_price) VALUES
 ('Keyboard', 75.20, FALSE, 75.20)
 ON CONFLICT (id) DO NOTHING; -- Чтобы не вставлять данные повторно при перезапуске
 
+-- Индексы для фильтров GET /products (см. queries.select_products_sql):
+-- is_active + диапазон цен / сортировка по цене
+CREATE INDEX IF NOT EXISTS products_is_active_price_idx ON products (is_active, price);
+-- Поиск по началу имени и подстроке (ILIKE) через триграммы
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS products_name_trgm_idx ON products USING gin (name gin_trgm_ops);
+
 
 CREATE TABLE IF NOT EXISTS coupons (
     id SERIAL PRIMARY KEY,
@@ -26,3 +34,65 @@ CREATE TABLE IF NOT EXISTS coupons (
 -- Добавим один купон для теста
 INSERT INTO coupons (code, discount_percent) VALUES ('SALE10', 10.00);
 
+
+
+-- Уведомления об изменении купонов: discount_service держит таблицу в памяти
+-- и по LISTEN coupons_changed обновляет изменённые коды (пустой payload = перечитать всё)
+CREATE OR REPLACE FUNCTION notify_coupons_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('coupons_changed', '');
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('coupons_changed', OLD.code);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('coupons_changed', NEW.code);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS coupons_changed ON coupons;
+CREATE TRIGGER coupons_changed
+    AFTER INSERT OR UPDATE OR DELETE ON coupons
+    FOR EACH ROW EXECUTE FUNCTION notify_coupons_changed();
+
+DROP TRIGGER IF EXISTS coupons_truncated ON coupons;
+CREATE TRIGGER coupons_truncated
+    AFTER TRUNCATE ON coupons
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_coupons_changed();
+
+
+-- Глобальный счётчик изменений каталога: по нему API отвечает 304 на /products
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id), -- Ровно одна строка
+    version BIGINT NOT NULL
+);
+INSERT INTO catalog_version (id, version) VALUES (TRUE, 1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_product_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_row_version ON products;
+CREATE TRIGGER products_row_version
+    BEFORE UPDATE ON products
+    FOR EACH ROW EXECUTE FUNCTION bump_product_version();
+
+-- Один инкремент на оператор, а не на строку: массовые изменения дешёвые
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_catalog_version ON products;
+CREATE TRIGGER products_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON products
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
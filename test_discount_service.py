@@ -0,0 +1,110 @@
+# test_discount_service.py
+import os
+import time
+from decimal import Decimal
+
+import allure
+import requests
+
+DISCOUNT_URL = os.environ.get("DISCOUNT_URL", "http://localhost:5001")
+
+
+def wait_for_price(price: str, coupon_code: str, expected: Decimal,
+                   timeout: float = 5.0) -> Decimal:
+    """Опрашивает сервис скидок, пока цена не станет ожидаемой."""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = requests.get(f"{DISCOUNT_URL}/product_discount",
+                                params={"price": price,
+                                        "coupon_code": coupon_code})
+        assert response.status_code == 200
+        new_price = Decimal(str(response.json()["price"]))
+        if new_price == expected or time.monotonic() > deadline:
+            return new_price
+        time.sleep(0.1)
+
+
+@allure.feature("Discount service")
+class TestCouponCache:
+    @allure.story("Known and unknown coupons")
+    def test_known_and_unknown_coupon(self):
+        assert wait_for_price("100.00", "SALE10", Decimal("90")) == \
+            Decimal("90")
+        assert wait_for_price("100.00", "NO_SUCH_CODE", Decimal("100")) == \
+            Decimal("100")
+
+    @allure.story("Coupon changes are picked up via LISTEN/NOTIFY")
+    def test_coupon_changes_invalidate_cache(self, db_connection):
+        code = "CACHE25"
+        cursor = db_connection.cursor()
+        try:
+            with allure.step("Прогрев кэша: купона ещё нет"):
+                assert wait_for_price("100.00", code, Decimal("100")) == \
+                    Decimal("100")
+            with allure.step("Добавляем купон в БД"):
+                cursor.execute(
+                    "INSERT INTO coupons (code, discount_percent) "
+                    "VALUES (%s, %s);", (code, Decimal("25.00")))
+                db_connection.commit()
+                assert wait_for_price("100.00", code, Decimal("75")) == \
+                    Decimal("75")
+            with allure.step("Меняем процент скидки"):
+                cursor.execute(
+                    "UPDATE coupons SET discount_percent = %s "
+                    "WHERE code = %s;", (Decimal("50.00"), code))
+                db_connection.commit()
+                assert wait_for_price("100.00", code, Decimal("50")) == \
+                    Decimal("50")
+        finally:
+            cursor.execute("DELETE FROM coupons WHERE code = %s;", (code,))
+            db_connection.commit()
+            cursor.close()
+        with allure.step("После удаления купон снова неизвестен"):
+            assert wait_for_price("100.00", code, Decimal("100")) == \
+                Decimal("100")
+
+        stats = requests.get(f"{DISCOUNT_URL}/debug/stats").json()
+        allure.attach(str(stats), 'Статистика кэша купонов',
+                      attachment_type=allure.attachment_type.TEXT)
+        assert stats["coupon_cache"]["notifications"] >= 3
+
+
+@allure.feature("Discount service")
+class TestBatchDiscount:
+    @allure.story("Batch pricing keeps order and mixes coupons")
+    def test_batch_prices(self):
+        items = [
+            {"price": "100.00", "coupon_code": "SALE10"},
+            {"price": "50.00", "coupon_code": "NO_SUCH_CODE"},
+            {"price": "200.00", "coupon_code": "SALE10"},
+            {"price": "10.00"},
+        ]
+        response = requests.post(f"{DISCOUNT_URL}/product_discounts",
+                                 json={"items": items})
+        assert response.status_code == 200
+        prices = [Decimal(str(p)) for p in response.json()["prices"]]
+        assert prices == [Decimal("90"), Decimal("50"), Decimal("180"),
+                          Decimal("10")]
+
+    @allure.story("Batch pricing rejects invalid items")
+    def test_batch_invalid_price(self):
+        response = requests.post(
+            f"{DISCOUNT_URL}/product_discounts",
+            json={"items": [{"price": "1.00"}, {"price": "abc"}]})
+        assert response.status_code == 400
+        assert response.json()["index"] == 1
+
+
+@allure.feature("Discount service")
+class TestDiscountMetrics:
+    @allure.story("/metrics exports request and coupon lookup histograms")
+    def test_metrics(self):
+        requests.get(f"{DISCOUNT_URL}/product_discount",
+                     params={"price": "10.00", "coupon_code": "SALE10"})
+        response = requests.get(f"{DISCOUNT_URL}/metrics")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert ('http_request_duration_seconds_count{method="GET",'
+                'route="/product_discount",status="200"}') in response.text
+        assert 'stage_duration_seconds_count{stage="coupon_lookup"}' in \
+            response.text
@@ -468,3 +468,532 @@ class TestDeleteProduct:
             product_id = 9999999
             response = requests.delete(f"{API_URL}/product/{product_id}")
             assert response.status_code == 204
+
+
+@allure.feature("Service statistics")
+class TestServiceStats:
+    @allure.story("Connection pool statistics")
+    def test_db_pool_stats(self, product_setup):
+        with allure.step("Несколько запросов подряд через пул"):
+            for _ in range(5):
+                response = requests.get(f"{API_URL}/product/{product_setup}")
+                assert response.status_code == 200
+        with allure.step("Проверка статистики пула"):
+            response = requests.get(f"{API_URL}/debug/stats")
+            assert response.status_code == 200
+            pool = response.json()["db_pool"]
+            allure.attach(str(pool), 'Статистика пула',
+                          attachment_type=allure.attachment_type.TEXT)
+            # Соединения возвращаются в пул после каждого запроса
+            assert pool["in_use"] == 0
+            assert pool["waiting"] == 0
+            assert 1 <= pool["size"] <= pool["max_size"]
+            assert pool["checkouts"] >= 5
+
+    @allure.story("Discount client statistics")
+    def test_discount_client_stats(self, product_setup):
+        with allure.step("Обновление с купоном вызывает сервис скидок"):
+            response = requests.put(f"{API_URL}/product/{product_setup}",
+                                    json={"name": "Test Product",
+                                          "price": "100.00",
+                                          "coupon_code": "SALE10"})
+            assert response.status_code == 200
+        with allure.step("Проверка счётчиков клиента"):
+            stats = requests.get(f"{API_URL}/debug/stats").json()
+            client = stats["discount_client"]
+            allure.attach(str(client), 'Статистика клиента скидок',
+                          attachment_type=allure.attachment_type.TEXT)
+            assert client["requests"] >= 1
+            assert client["breaker"]["state"] == "closed"
+            for counter in ("opens", "half_opens", "rejected", "fallbacks"):
+                assert counter in client or counter in client["breaker"]
+
+
+    @allure.story("Product cache serves repeated reads and sees writes")
+    def test_product_cache(self, product_setup):
+        stats = requests.get(f"{API_URL}/debug/stats").json()
+        if stats["product_cache"] is None:
+            pytest.skip("Product cache is disabled (PRODUCT_CACHE_SIZE=0)")
+        hits_before = stats["product_cache"]["hits"]
+        for _ in range(3):
+            assert requests.get(
+                f"{API_URL}/product/{product_setup}").status_code == 200
+        stats = requests.get(f"{API_URL}/debug/stats").json()
+        assert stats["product_cache"]["hits"] >= hits_before + 2
+
+        with allure.step("Обновление инвалидирует запись кэша"):
+            response = requests.put(f"{API_URL}/product/{product_setup}",
+                                    json={"name": "Cached Product",
+                                          "price": "100.00"})
+            assert response.status_code == 200
+            response = requests.get(f"{API_URL}/product/{product_setup}")
+            assert response.json()["name"] == "Cached Product"
+
+        with allure.step("Удаление инвалидирует запись кэша"):
+            requests.delete(f"{API_URL}/product/{product_setup}")
+            response = requests.get(f"{API_URL}/product/{product_setup}")
+            assert response.status_code == 404
+
+
+@allure.feature("Product Management LIST Via API")
+class TestListProducts:
+    @allure.story("Full catalogue is streamed as a JSON array")
+    def test_get_all_products_streamed(self, db_connection, product_setup):
+        response = requests.get(f"{API_URL}/products")
+        assert response.status_code == 200
+        products = response.json()
+        ids = [p["id"] for p in products]
+        assert product_setup in ids
+        with db_connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM products;")
+            assert len(products) == cursor.fetchone()[0]
+
+    @allure.story("Keyset pagination with an opaque cursor")
+    def test_keyset_pagination(self, db_connection, custom_product_cleanup):
+        with allure.step("Создаём несколько продуктов"):
+            for i in range(3):
+                response = requests.post(f"{API_URL}/product",
+                                         json={"name": f"Page item {i}",
+                                               "price": "10.00"})
+                assert response.status_code == 201
+                custom_product_cleanup(response.json()["id"])
+
+        with allure.step("Обходим каталог страницами по 2"):
+            seen = []
+            params = {"limit": 2}
+            while True:
+                response = requests.get(f"{API_URL}/products", params=params)
+                assert response.status_code == 200
+                page = response.json()
+                assert len(page) <= 2
+                seen.extend(p["id"] for p in page)
+                next_cursor = response.headers.get("X-Next-Cursor")
+                if not next_cursor:
+                    break
+                params = {"limit": 2, "after": next_cursor}
+
+        with allure.step("Страницы идут по возрастанию id без повторов"):
+            assert seen == sorted(seen)
+            assert len(seen) == len(set(seen))
+            with db_connection.cursor() as cursor:
+                cursor.execute("SELECT id FROM products ORDER BY id;")
+                assert seen == [row[0] for row in cursor.fetchall()]
+
+    @pytest.mark.parametrize("params", [
+        {"limit": "0"},
+        {"limit": "abc"},
+        {"limit": "100000"},
+        {"after": "not-a-cursor"},
+    ])
+    def test_invalid_pagination_params(self, params):
+        response = requests.get(f"{API_URL}/products", params=params)
+        assert response.status_code == 400
+
+
+@allure.feature("Conditional GET")
+class TestConditionalGet:
+    @allure.story("Unchanged product returns 304")
+    def test_product_not_modified(self, product_setup):
+        response = requests.get(f"{API_URL}/product/{product_setup}")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = requests.get(f"{API_URL}/product/{product_setup}",
+                                headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        with allure.step("После изменения ETag меняется"):
+            requests.put(f"{API_URL}/product/{product_setup}",
+                         json={"name": "Changed", "price": "100.00"})
+            response = requests.get(f"{API_URL}/product/{product_setup}",
+                                    headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+            assert response.json()["name"] == "Changed"
+
+    @allure.story("Unchanged catalogue returns 304")
+    def test_products_not_modified(self, custom_product_cleanup):
+        response = requests.get(f"{API_URL}/products")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = requests.get(f"{API_URL}/products",
+                                headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        with allure.step("Добавление продукта меняет версию каталога"):
+            response = requests.post(f"{API_URL}/product",
+                                     json={"name": "Etag item",
+                                           "price": "5.00"})
+            custom_product_cleanup(response.json()["id"])
+            response = requests.get(f"{API_URL}/products",
+                                    headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+
+
+@allure.feature("Product Management UPDATE Via API")
+class TestOptimisticConcurrency:
+    @allure.story("If-Match with a stale ETag returns 412")
+    def test_if_match_stale_etag(self, db_connection, product_setup):
+        url = f"{API_URL}/product/{product_setup}"
+        etag = requests.get(url).headers["ETag"]
+
+        with allure.step("Первое обновление с актуальным ETag проходит"):
+            response = requests.put(url, json={"name": "First writer",
+                                               "price": "100.00"},
+                                    headers={"If-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+
+        with allure.step("Второе обновление со старым ETag отклоняется"):
+            response = requests.put(url, json={"name": "Second writer",
+                                               "price": "100.00"},
+                                    headers={"If-Match": etag})
+            assert response.status_code == 412
+
+        with db_connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM products WHERE id = %s;",
+                           (product_setup,))
+            assert cursor.fetchone()[0] == "First writer"
+
+    @allure.story("Stale version in the body returns 409")
+    def test_body_version_conflict(self, product_setup):
+        url = f"{API_URL}/product/{product_setup}"
+        version = requests.get(url).json()["version"]
+        response = requests.put(url, json={"name": "A", "price": "1.00",
+                                           "version": version})
+        assert response.status_code == 200
+        response = requests.put(url, json={"name": "B", "price": "1.00",
+                                           "version": version})
+        assert response.status_code == 409
+        assert response.json()["current_version"] == version + 1
+
+    @allure.story("If-Match on a missing product returns 404")
+    def test_if_match_missing_product(self):
+        response = requests.put(f"{API_URL}/product/99999999",
+                                json={"name": "x", "price": "1.00"},
+                                headers={"If-Match": '"99999999-1"'})
+        assert response.status_code == 404
+
+
+@allure.feature("Product Management BULK import Via API")
+class TestBulkImport:
+    @allure.story("JSON array with valid and invalid rows")
+    def test_bulk_json_array(self, db_connection, custom_product_cleanup):
+        rows = [
+            {"name": "Bulk A", "price": "10.00"},
+            {"name": "", "price": "1.00"},
+            {"name": "Bulk B", "price": "20.50", "is_active": False},
+            {"name": "Bulk C", "price": "abc"},
+        ]
+        response = requests.post(f"{API_URL}/products/bulk", json=rows)
+        assert response.status_code == 201
+        body = response.json()
+        for product_id in body["ids"]:
+            if product_id is not None:
+                custom_product_cleanup(product_id)
+
+        assert body["inserted"] == 2
+        assert body["ids"][1] is None and body["ids"][3] is None
+        assert [e["index"] for e in body["errors"]] == [1, 3]
+        assert body["errors"][0]["error"] == "Missing name or price"
+
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, price, is_active, original_price FROM products WHERE id = %s;",
+                (body["ids"][2],))
+            assert cursor.fetchone() == ("Bulk B", Decimal("20.50"), False,
+                                         Decimal("20.50"))
+
+    @allure.story("NDJSON stream large enough to use COPY")
+    def test_bulk_ndjson_copy(self, db_connection, custom_product_cleanup):
+        count = 1200
+        lines = "\n".join(
+            '{"name": "Bulk \\"quoted\\", item %d", "price": "%d.25"}'
+            % (i, i) for i in range(count))
+        response = requests.post(
+            f"{API_URL}/products/bulk", data=lines.encode(),
+            headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 201
+        ids = response.json()["ids"]
+        for product_id in ids:
+            custom_product_cleanup(product_id)
+        assert len(ids) == count and None not in ids
+
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, name, price FROM products WHERE id = ANY(%s);",
+                (ids,))
+            rows = {row[0]: row[1:] for row in cursor.fetchall()}
+        assert len(rows) == count
+        # Каждый id соответствует своей строке запроса
+        for i in (0, 599, count - 1):
+            assert rows[ids[i]] == (f'Bulk "quoted", item {i}',
+                                    Decimal(f"{i}.25"))
+
+    @allure.story("Body that is not an array is rejected")
+    def test_bulk_invalid_body(self):
+        response = requests.post(f"{API_URL}/products/bulk",
+                                 json={"name": "x", "price": "1"})
+        assert response.status_code == 400
+
+
+@allure.feature("Product catalogue export Via API")
+class TestExport:
+    @allure.story("CSV export matches the database")
+    def test_export_csv(self, db_connection, product_setup):
+        import csv
+        import io
+        response = requests.get(f"{API_URL}/products/export",
+                                params={"format": "csv"})
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        with db_connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM products;")
+            assert len(rows) == cursor.fetchone()[0]
+        row = next(r for r in rows if int(r["id"]) == product_setup)
+        assert row["name"] == "Test Product"
+        assert Decimal(row["price"]) == Decimal("100.00")
+
+    @allure.story("NDJSON export keeps special characters and filters")
+    def test_export_ndjson_filtered(self, custom_product_cleanup):
+        import json
+        tricky_name = 'Back\\slash "quote", tab\there'
+        response = requests.post(f"{API_URL}/product",
+                                 json={"name": tricky_name, "price": "7.50",
+                                       "is_active": False})
+        product_id = response.json()["id"]
+        custom_product_cleanup(product_id)
+
+        response = requests.get(f"{API_URL}/products/export",
+                                params={"format": "ndjson",
+                                        "is_active": "false"})
+        assert response.status_code == 200
+        products = [json.loads(line) for line in response.text.splitlines()]
+        assert all(p["is_active"] is False for p in products)
+        exported = next(p for p in products if p["id"] == product_id)
+        assert exported["name"] == tricky_name
+        assert exported["price"] == "7.50"
+
+    @pytest.mark.parametrize("params", [{"format": "xml"},
+                                        {"is_active": "maybe"}])
+    def test_export_invalid_params(self, params):
+        response = requests.get(f"{API_URL}/products/export", params=params)
+        assert response.status_code == 400
+
+
+@allure.feature("Product Management GET Via API")
+class TestPriceFormat:
+    @allure.story("Prices are 2-decimal strings in every endpoint")
+    def test_price_format_consistent(self, custom_product_cleanup):
+        response = requests.post(f"{API_URL}/product",
+                                 json={"name": "Format Product",
+                                       "price": "5", "is_active": True})
+        product_id = response.json()["id"]
+        custom_product_cleanup(product_id)
+
+        single = requests.get(f"{API_URL}/product/{product_id}").json()
+        page = requests.get(f"{API_URL}/products",
+                            params={"limit": 5}).json()
+        full = requests.get(f"{API_URL}/products").json()
+        streamed = next(p for p in full if p["id"] == product_id)
+        for product in [single, streamed] + page:
+            assert isinstance(product["price"], str)
+            assert len(product["price"].split(".")[1]) == 2
+        assert single["price"] == streamed["price"] == "5.00"
+        assert single["original_price"] == "5.00"
+
+
+@allure.feature("Product List Via API")
+class TestFilterProducts:
+    @pytest.fixture
+    def filter_products(self, custom_product_cleanup):
+        # Уникальный префикс, чтобы не зависеть от остального каталога
+        prefix = f"Flt{os.getpid()}"
+        rows = [(f"{prefix} Alpha", "10.00", True),
+                (f"{prefix} Beta", "20.00", True),
+                (f"{prefix} Gamma", "20.00", False),
+                (f"{prefix} Delta_%", "30.00", True)]
+        response = requests.post(f"{API_URL}/products/bulk",
+                                 json=[{"name": name, "price": price,
+                                        "is_active": is_active}
+                                       for name, price, is_active in rows])
+        ids = response.json()["ids"]
+        for product_id in ids:
+            custom_product_cleanup(product_id)
+        return prefix, ids
+
+    @allure.story("Filter by name prefix, price range and status")
+    def test_filters(self, filter_products):
+        prefix, ids = filter_products
+        response = requests.get(f"{API_URL}/products",
+                                params={"name_prefix": prefix.lower(),
+                                        "is_active": "true",
+                                        "min_price": "15",
+                                        "max_price": "30"})
+        assert response.status_code == 200
+        assert [p["id"] for p in response.json()] == [ids[1], ids[3]]
+
+    @allure.story("Substring search escapes LIKE wildcards")
+    def test_name_substring(self, filter_products):
+        prefix, ids = filter_products
+        response = requests.get(f"{API_URL}/products",
+                                params={"name": f"{prefix} delta_%"})
+        assert [p["id"] for p in response.json()] == [ids[3]]
+        response = requests.get(f"{API_URL}/products",
+                                params={"name": f"{prefix} _"})
+        assert response.json() == []
+
+    @allure.story("Sorted pages follow the keyset cursor")
+    def test_sort_by_price_desc_paged(self, filter_products):
+        prefix, ids = filter_products
+        seen = []
+        params = {"name_prefix": prefix, "sort": "-price", "limit": 1}
+        while True:
+            response = requests.get(f"{API_URL}/products", params=params)
+            assert response.status_code == 200
+            seen.extend(p["id"] for p in response.json())
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["after"] = response.headers["X-Next-Cursor"]
+        # Равные цены упорядочены по id в том же направлении
+        assert seen == [ids[3], ids[2], ids[1], ids[0]]
+
+    @pytest.mark.parametrize("params", [{"sort": "color"},
+                                        {"min_price": "cheap"},
+                                        {"is_active": "maybe"}])
+    def test_invalid_filter_params(self, params):
+        response = requests.get(f"{API_URL}/products", params=params)
+        assert response.status_code == 400
+
+
+@allure.feature("Coupon Campaigns Via API")
+class TestCampaigns:
+    @pytest.fixture
+    def campaign_products(self, custom_product_cleanup):
+        rows = [{"name": "Campaign A", "price": "100.00"},
+                {"name": "Campaign B", "price": "19.99"},
+                {"name": "Campaign C", "price": "50.00", "is_active": False}]
+        response = requests.post(f"{API_URL}/products/bulk", json=rows)
+        ids = response.json()["ids"]
+        for product_id in ids:
+            custom_product_cleanup(product_id)
+        return ids
+
+    def _prices(self, ids):
+        return [requests.get(f"{API_URL}/product/{i}").json()["price"]
+                for i in ids]
+
+    @allure.story("Apply and revert a coupon for filtered products")
+    def test_apply_and_revert(self, campaign_products):
+        ids = campaign_products
+        payload = {"coupon_code": "SALE10",
+                   "filter": {"ids": ids, "is_active": True}}
+        response = requests.post(f"{API_URL}/campaigns/apply", json=payload)
+        assert response.status_code == 200
+        assert response.json() == {"status": "success", "updated": 2}
+        # Неактивный продукт под фильтр не попал
+        assert self._prices(ids) == ["90.00", "17.99", "50.00"]
+
+        # Повторное применение ничего не меняет
+        response = requests.post(f"{API_URL}/campaigns/apply", json=payload)
+        assert response.json()["updated"] == 0
+
+        response = requests.post(f"{API_URL}/campaigns/revert",
+                                 json={"filter": {"ids": ids}})
+        assert response.status_code == 200
+        assert response.json()["updated"] == 2
+        assert self._prices(ids) == ["100.00", "19.99", "50.00"]
+
+    @allure.story("Campaign price matches the discount service formula")
+    def test_same_price_as_put_with_coupon(self, campaign_products):
+        product_id = campaign_products[1]
+        requests.put(f"{API_URL}/product/{product_id}",
+                     json={"name": "Campaign B", "price": "19.99",
+                           "coupon_code": "SALE10"})
+        via_put = self._prices([product_id])[0]
+        requests.post(f"{API_URL}/campaigns/revert",
+                      json={"filter": {"ids": [product_id]}})
+        requests.post(f"{API_URL}/campaigns/apply",
+                      json={"coupon_code": "SALE10",
+                            "filter": {"ids": [product_id]}})
+        assert self._prices([product_id])[0] == via_put
+
+    @allure.story("Price range filter")
+    def test_price_range(self, campaign_products):
+        ids = campaign_products
+        response = requests.post(f"{API_URL}/campaigns/apply",
+                                 json={"coupon_code": "SALE10",
+                                       "filter": {"ids": ids,
+                                                  "min_price": "20",
+                                                  "max_price": 100}})
+        assert response.json()["updated"] == 2
+        assert self._prices(ids) == ["90.00", "19.99", "45.00"]
+
+    def test_unknown_coupon(self, campaign_products):
+        response = requests.post(f"{API_URL}/campaigns/apply",
+                                 json={"coupon_code": "NO_SUCH_COUPON",
+                                       "filter": {"ids": campaign_products}})
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize("payload", [
+        {},
+        {"coupon_code": "SALE10", "filter": {"ids": "1,2"}},
+        {"coupon_code": "SALE10", "filter": {"min_price": "cheap"}},
+        {"coupon_code": "SALE10", "filter": {"color": "red"}},
+    ])
+    def test_invalid_campaign(self, payload):
+        response = requests.post(f"{API_URL}/campaigns/apply", json=payload)
+        assert response.status_code == 400
+
+
+@allure.feature("Service metrics")
+class TestMetrics:
+    @staticmethod
+    def _sample(text, name):
+        # Значение серии из текстового формата Prometheus (0, если её нет)
+        for line in text.splitlines():
+            if line.startswith(name + " "):
+                return float(line.split()[-1])
+        return 0.0
+
+    @allure.story("/metrics exports per-route and per-stage histograms")
+    def test_metrics(self, product_setup):
+        series = ('http_request_duration_seconds_count{method="GET",'
+                  'route="/product/<int:product_id>",status="200"}')
+        before = self._sample(requests.get(f"{API_URL}/metrics").text, series)
+        requests.get(f"{API_URL}/product/{product_setup}")
+        response = requests.get(f"{API_URL}/metrics")
+        assert response.status_code == 200
+        assert self._sample(response.text, series) == before + 1
+        for stage in ("db", "serialization"):
+            assert self._sample(
+                response.text,
+                f'stage_duration_seconds_count{{stage="{stage}"}}') > 0
+        # Путь с id не порождает отдельных серий
+        assert f"/product/{product_setup}" not in response.text
+
+
+@allure.feature("Service metrics")
+class TestSlowQueries:
+    @allure.story("Per-statement timings and slow query log")
+    def test_slow_query_log(self, product_setup):
+        assert requests.delete(
+            f"{API_URL}/debug/slow-queries").status_code == 204
+        requests.get(f"{API_URL}/products", params={"limit": 5,
+                                                     "name": "Test"})
+        response = requests.get(f"{API_URL}/debug/slow-queries")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["threshold_ms"] >= 0
+        statement = next(s for s in data["statements"]
+                         if "ILIKE" in s["sql"])
+        assert statement["count"] >= 1
+        assert statement["max_ms"] >= statement["avg_ms"] > 0
+        for entry in data["slow"]:
+            assert entry["duration_ms"] >= data["threshold_ms"]
+            # Только форма параметров, без значений
+            assert "%Test%" not in str(entry["params"])